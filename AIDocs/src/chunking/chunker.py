@@ -1,12 +1,75 @@
 """Smart text chunking with word-based overlap."""
+import logging
 import re
-from typing import List, Dict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Dict, Iterable, Iterator, Tuple
+import numpy as np
+try:
+    from numba import njit
+except ImportError:  # numba is optional; run the packing loop as plain Python
+    def njit(*args, **kwargs):
+        return lambda func: func
 from src.utils import setup_logger, get_settings, get_paths, save_json, load_json, ensure_dir
 import os
 from pathlib import Path
 
 logger = setup_logger(__name__)
 
+# Whitespace that follows sentence-ending punctuation
+_SENTENCE_RE = re.compile(r'(?<=[.!?])\s+')
+
+
+@njit(cache=True)
+def _pack_sentences(cum_words: np.ndarray, chunk_size: int, overlap: int) -> np.ndarray:
+    """
+    Greedily pack sentences into chunks using only their word counts.
+    
+    Args:
+        cum_words: cum_words[i] is the number of words in the first i sentences
+        chunk_size: Maximum words per chunk (a single longer sentence still fits)
+        overlap: Words carried from one chunk into the next
+        
+    Returns:
+        Array of (start, end, carried) rows, one per chunk: the chunk is the last
+        `carried` words of the previous chunk followed by sentences[start:end].
+        The last row is the trailing chunk, before the minimum-size check.
+    """
+    num_sentences = cum_words.shape[0] - 1
+    segments = np.empty((num_sentences + 1, 3), dtype=np.int64)
+    num_segments = 0
+    current = 0
+    carried = 0
+    start = 0
+    i = 0
+    
+    while i < num_sentences:
+        # If adding the next sentence exceeds chunk size, close the current chunk
+        if current > 0 and current + cum_words[i + 1] - cum_words[i] > chunk_size:
+            segments[num_segments, 0] = start
+            segments[num_segments, 1] = i
+            segments[num_segments, 2] = carried
+            num_segments += 1
+            
+            # Keep the last N words as overlap (all of them when overlap is 0)
+            if overlap > 0 and current > overlap:
+                current = overlap
+            carried = current
+            start = i
+        
+        # Add this sentence plus every following sentence that still fits
+        limit = cum_words[i] + chunk_size - current
+        end = max(i + 1, np.searchsorted(cum_words, limit, side='right') - 1)
+        current += cum_words[end] - cum_words[i]
+        i = end
+    
+    if current > 0:
+        segments[num_segments, 0] = start
+        segments[num_segments, 1] = num_sentences
+        segments[num_segments, 2] = carried
+        num_segments += 1
+    
+    return segments[:num_segments]
+
 
 class TextChunker:
     """Smart chunking with word-based size and overlap."""
@@ -20,15 +83,14 @@ class TextChunker:
         self.overlap_words = chunking_config.get('overlap_words', 75)
         self.min_chunk_size = chunking_config.get('min_chunk_size_words', 100)
         
+        # Documents with at least this many pages are chunked in a process pool
+        self.parallel_min_pages = chunking_config.get('parallel_min_pages', 100)
+        
         self.paths = get_paths()
         ensure_dir(self.paths['processed_chunks_dir'])
         
         logger.info(f"Text Chunker initialized: {self.chunk_size_words} words, {self.overlap_words} overlap")
     
-    def count_words(self, text: str) -> int:
-        """Count words in text."""
-        return len(text.split())
-    
     def split_into_sentences(self, text: str) -> List[str]:
         """
         Split text into sentences using regex.
@@ -40,16 +102,20 @@ class TextChunker:
             List of sentences
         """
         # Simple sentence splitting (can be improved with NLTK)
-        sentences = re.split(r'(?<=[.!?])\s+', text)
-        return [s.strip() for s in sentences if s.strip()]
+        # No whitespace normalization pass first: the regex already absorbs any
+        # whitespace run and str.split() handles the rest, so it would only add a scan
+        sentences = _SENTENCE_RE.split(text)
+        # Strip each piece once and drop the empty ones
+        return [s for s in map(str.strip, sentences) if s]
     
-    def create_chunks(self, text: str, metadata: Dict = None) -> List[Dict]:
+    def create_chunks(self, text: str, metadata: Dict = None, start_idx: int = 0) -> List[Dict]:
         """
         Create word-based chunks with overlap.
         
         Args:
             text: Input text
             metadata: Optional metadata to attach to chunks
+            start_idx: chunk_id of the first chunk created
             
         Returns:
             List of chunk dictionaries
@@ -59,106 +125,124 @@ class TextChunker:
         
         # Split into sentences for better boundary detection
         sentences = self.split_into_sentences(text)
+        sentence_words = [sentence.split() for sentence in sentences]
+        num_sentences = len(sentence_words)
         
-        chunks = []
-        current_chunk = []
-        current_word_count = 0
-        chunk_index = 0
+        # cum_words[i] = number of words in sentences[:i]
+        cum_words = np.zeros(num_sentences + 1, dtype=np.int64)
+        np.cumsum(
+            np.fromiter(map(len, sentence_words), dtype=np.int64, count=num_sentences),
+            out=cum_words[1:]
+        )
         
-        for sentence in sentences:
-            sentence_words = sentence.split()
-            sentence_word_count = len(sentence_words)
+        segments = _pack_sentences(cum_words, self.chunk_size_words, self.overlap_words)
+        
+        # Materialize chunk texts from the packed sentence ranges
+        chunks = []
+        previous_words = []
+        last = len(segments) - 1
+        for n, (start, end, carried) in enumerate(segments.tolist()):
+            chunk_words = previous_words[len(previous_words) - carried:] if carried else []
+            for words in sentence_words[start:end]:
+                chunk_words.extend(words)
+            previous_words = chunk_words
             
-            # If adding this sentence exceeds chunk size, save current chunk
-            if current_word_count + sentence_word_count > self.chunk_size_words and current_chunk:
-                chunk_text = ' '.join(current_chunk)
-                
-                chunks.append({
-                    'chunk_id': chunk_index,
-                    'text': chunk_text,
-                    'word_count': current_word_count,
-                    'metadata': metadata or {}
-                })
-                
-                chunk_index += 1
-                
-                # Create overlap by keeping last N words
-                overlap_text = ' '.join(current_chunk[-self.overlap_words:]) if len(current_chunk) > self.overlap_words else ' '.join(current_chunk)
-                current_chunk = overlap_text.split()
-                current_word_count = len(current_chunk)
+            # Add final chunk only if it meets minimum size
+            if n == last and len(chunk_words) < self.min_chunk_size:
+                break
             
-            # Add sentence to current chunk
-            current_chunk.extend(sentence_words)
-            current_word_count += sentence_word_count
-        
-        # Add final chunk if it meets minimum size
-        if current_chunk and current_word_count >= self.min_chunk_size:
-            chunk_text = ' '.join(current_chunk)
             chunks.append({
-                'chunk_id': chunk_index,
-                'text': chunk_text,
-                'word_count': current_word_count,
+                'chunk_id': start_idx + n,
+                'text': ' '.join(chunk_words),
+                'word_count': len(chunk_words),
                 'metadata': metadata or {}
             })
         
-        logger.debug(f"Created {len(chunks)} chunks from {self.count_words(text)} words")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Created {len(chunks)} chunks from {int(cum_words[-1])} words")
         return chunks
     
-    def chunk_document_pages(self, pages: List[Dict], doc_metadata: Dict = None) -> List[Dict]:
+    def iter_document_chunks(
+        self,
+        pages: Iterable[Dict],
+        doc_metadata: Dict = None,
+        parallel: bool = True
+    ) -> Iterator[Dict]:
         """
-        Chunk document pages while preserving page numbers.
+        Lazily chunk document pages, yielding globally indexed chunks.
         
         Args:
-            pages: List of page dictionaries with 'page_number' and 'text'
+            pages: Page dictionaries with 'page_number' and 'text'
             doc_metadata: Document-level metadata
+            parallel: Allow splitting large documents across processes
             
-        Returns:
-            List of chunks with page information
+        Yields:
+            Chunks with page information, in page order
         """
-        all_chunks = []
+        # Document-level fields are the same for every page
+        doc_fields = {}
+        if doc_metadata:
+            doc_fields = {
+                'document_title': doc_metadata.get('title', ''),
+                'document_author': doc_metadata.get('author', ''),
+                'filename': doc_metadata.get('filename', '')
+            }
+        
+        page_texts = []
+        page_metadatas = []
         
         for page in pages:
-            page_number = page.get('page_number', 0)
             page_text = page.get('text', '')
             
             if not page_text.strip():
                 continue
             
             # Create metadata for this page
-            chunk_metadata = {
-                'page_number': page_number,
-                'extraction_method': page.get('method', 'unknown')
-            }
-            
-            # Add document metadata if provided
-            if doc_metadata:
-                chunk_metadata.update({
-                    'document_title': doc_metadata.get('title', ''),
-                    'document_author': doc_metadata.get('author', ''),
-                    'filename': doc_metadata.get('filename', '')
-                })
-            
-            # Create chunks for this page
-            page_chunks = self.create_chunks(page_text, chunk_metadata)
-            all_chunks.extend(page_chunks)
-        
-        # Re-index chunks globally
-        for i, chunk in enumerate(all_chunks):
-            chunk['chunk_id'] = i
+            page_texts.append(page_text)
+            page_metadatas.append({
+                'page_number': page.get('page_number', 0),
+                'extraction_method': page.get('method', 'unknown'),
+                **doc_fields
+            })
         
-        logger.info(f"Created {len(all_chunks)} chunks from {len(pages)} pages")
-        return all_chunks
+        # Create chunks for each page; large documents are split across processes
+        chunk_index = 0
+        if parallel and self.parallel_min_pages and len(page_texts) >= self.parallel_min_pages:
+            workers = os.cpu_count() or 1
+            chunksize = max(1, len(page_texts) // (workers * 4))
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                for page_chunks in executor.map(
+                    self.create_chunks, page_texts, page_metadatas, chunksize=chunksize
+                ):
+                    # Pages are chunked independently, so offset their local ids
+                    for chunk in page_chunks:
+                        chunk['chunk_id'] += chunk_index
+                        yield chunk
+                    chunk_index += len(page_chunks)
+        else:
+            for page_text, chunk_metadata in zip(page_texts, page_metadatas):
+                page_chunks = self.create_chunks(page_text, chunk_metadata, start_idx=chunk_index)
+                chunk_index += len(page_chunks)
+                yield from page_chunks
     
-    def process_extracted_document(self, extracted_json_path: str) -> List[Dict]:
+    def chunk_document_pages(self, pages: List[Dict], doc_metadata: Dict = None) -> List[Dict]:
         """
-        Process an extracted document JSON file.
+        Chunk document pages while preserving page numbers.
         
         Args:
-            extracted_json_path: Path to extracted text JSON
+            pages: List of page dictionaries with 'page_number' and 'text'
+            doc_metadata: Document-level metadata
             
         Returns:
-            List of chunks
+            List of chunks with page information
         """
+        all_chunks = list(self.iter_document_chunks(pages, doc_metadata))
+        
+        logger.info(f"Created {len(all_chunks)} chunks from {len(pages)} pages")
+        return all_chunks
+    
+    def _chunk_extracted_document(self, extracted_json_path: str) -> Tuple[Dict, List[Dict], int]:
+        """Load an extracted document JSON file and chunk it."""
         logger.info(f"Processing extracted document: {extracted_json_path}")
         
         # Load extracted document
@@ -169,8 +253,16 @@ class TextChunker:
         
         # Create chunks
         chunks = self.chunk_document_pages(pages, metadata)
-        
-        # Save chunks
+        return metadata, chunks, len(pages)
+    
+    def _save_chunks(
+        self,
+        extracted_json_path: str,
+        metadata: Dict,
+        chunks: List[Dict],
+        total_pages: int
+    ) -> str:
+        """Save a document's chunks next to the other processed chunk files."""
         output_filename = Path(extracted_json_path).stem.replace('_extracted', '_chunks.json')
         output_path = os.path.join(self.paths['processed_chunks_dir'], output_filename)
         
@@ -179,19 +271,37 @@ class TextChunker:
             'chunks': chunks,
             'statistics': {
                 'total_chunks': len(chunks),
-                'total_pages': len(pages)
+                'total_pages': total_pages
             }
         }, output_path)
         
         logger.info(f"Saved {len(chunks)} chunks to {output_path}")
+        return output_path
+    
+    def process_extracted_document(self, extracted_json_path: str) -> List[Dict]:
+        """
+        Process an extracted document JSON file.
+        
+        Args:
+            extracted_json_path: Path to extracted text JSON
+            
+        Returns:
+            List of chunks
+        """
+        metadata, chunks, total_pages = self._chunk_extracted_document(extracted_json_path)
+        self._save_chunks(extracted_json_path, metadata, chunks, total_pages)
         return chunks
     
-    def process_directory(self, directory: str = None) -> List[Dict]:
+    def process_directory(self, directory: str = None, max_writers: int = 4) -> List[Dict]:
         """
         Process all extracted documents in a directory.
         
+        Chunk files are written by a small thread pool, so saving one document
+        overlaps with chunking the next.
+        
         Args:
             directory: Directory path (defaults to extracted_texts_dir)
+            max_writers: Maximum number of chunk files written concurrently
             
         Returns:
             List of all chunks from all documents
@@ -203,12 +313,23 @@ class TextChunker:
         logger.info(f"Found {len(json_files)} extracted documents in {directory}")
         
         all_chunks = []
-        for json_path in json_files:
-            try:
-                chunks = self.process_extracted_document(str(json_path))
-                all_chunks.extend(chunks)
-            except Exception as e:
-                logger.error(f"Error processing {json_path}: {e}")
+        pending_writes = []
+        with ThreadPoolExecutor(max_workers=max(1, max_writers)) as writer:
+            for json_path in json_files:
+                try:
+                    metadata, chunks, total_pages = self._chunk_extracted_document(str(json_path))
+                    pending_writes.append((json_path, writer.submit(
+                        self._save_chunks, str(json_path), metadata, chunks, total_pages
+                    )))
+                    all_chunks.extend(chunks)
+                except Exception as e:
+                    logger.error(f"Error processing {json_path}: {e}")
+            
+            for json_path, future in pending_writes:
+                try:
+                    future.result()
+                except Exception as e:
+                    logger.error(f"Error saving chunks for {json_path}: {e}")
         
         logger.info(f"Processed {len(all_chunks)} total chunks from {len(json_files)} documents")
         return all_chunks
@@ -1,12 +1,37 @@
 """Embedding generation using Gemini API."""
-from typing import List, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+from itertools import islice
+from typing import List, Dict, Optional, Tuple, Iterable, Iterator
+import threading
+import time
+import numpy as np
 import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential
 from tqdm import tqdm
-import time
 from src.utils import setup_logger, get_model_config, get_api_key, load_env
 
 logger = setup_logger(__name__)
 
+# Errors worth retrying: rate limiting (429) and server-side failures (5xx)
+RETRYABLE_ERRORS = (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.TooManyRequests,
+    google_exceptions.ServerError,
+)
+
+
+@lru_cache(maxsize=1024)
+def _embed_query_cached(model_name: str, task_type: str, text: str) -> Tuple[float, ...]:
+    """Embed a query string; memoized so repeated queries skip the API call."""
+    result = genai.embed_content(
+        model=model_name,
+        content=text,
+        task_type=task_type
+    )
+    return tuple(result['embedding'])
+
 
 class EmbeddingGenerator:
     """Generate embeddings using Gemini API."""
@@ -26,6 +51,16 @@ class EmbeddingGenerator:
         self.dimension = self.embedding_config.get('dimension', 768)
         self.batch_size = self.embedding_config.get('batch_size', 100)
         self.task_type = self.embedding_config.get('task_type', 'RETRIEVAL_DOCUMENT')
+        self.max_workers = self.embedding_config.get('max_workers', 8)
+        self.requests_per_minute = self.embedding_config.get('requests_per_minute', 0)
+        # In-memory dtype for embedding matrices ('float32' or 'float16')
+        self.dtype = np.dtype(self.embedding_config.get('dtype', 'float32'))
+        if self.dtype not in (np.float32, np.float16):
+            raise ValueError(f"Unsupported embedding dtype: {self.dtype}")
+        
+        # Request pacing shared by all worker threads (0 disables the limit)
+        self._rate_lock = threading.Lock()
+        self._next_request_time = 0.0
         
         logger.info(f"Embedding Generator initialized: {self.model_name}, dim={self.dimension}")
     
@@ -57,6 +92,59 @@ class EmbeddingGenerator:
             logger.error(f"Error generating embedding: {e}")
             return [0.0] * self.dimension
     
+    def _wait_for_rate_limit(self) -> None:
+        """Block until the next request is allowed under requests_per_minute."""
+        if not self.requests_per_minute:
+            return
+        
+        interval = 60.0 / self.requests_per_minute
+        with self._rate_lock:
+            now = time.monotonic()
+            wait = self._next_request_time - now
+            self._next_request_time = max(now, self._next_request_time) + interval
+        
+        if wait > 0:
+            time.sleep(wait)
+    
+    @retry(
+        retry=retry_if_exception_type(RETRYABLE_ERRORS),
+        wait=wait_exponential(multiplier=1, min=1, max=30),
+        stop=stop_after_attempt(5),
+        reraise=True
+    )
+    def _embed_content(self, texts: List[str], task_type: str) -> List[List[float]]:
+        """Embed a list of texts in a single API request, retrying on 429/5xx."""
+        self._wait_for_rate_limit()
+        result = genai.embed_content(
+            model=self.model_name,
+            content=texts,
+            task_type=task_type
+        )
+        return result['embedding']
+    
+    def _embed_batch(self, batch: List[str], task_type: str) -> List[List[float]]:
+        """
+        Embed one batch of texts with a single request.
+        
+        Empty texts are not sent to the API and get zero vectors instead.
+        
+        Args:
+            batch: List of input texts
+            task_type: Task type for embeddings
+            
+        Returns:
+            List of embedding vectors, aligned with the input batch
+        """
+        vectors = [[0.0] * self.dimension for _ in batch]
+        indices = [j for j, text in enumerate(batch) if text.strip()]
+        
+        if indices:
+            batch_embeddings = self._embed_content([batch[j] for j in indices], task_type)
+            for j, embedding in zip(indices, batch_embeddings):
+                vectors[j] = embedding
+        
+        return vectors
+    
     def generate_embeddings_batch(
         self, 
         texts: List[str], 
@@ -74,33 +162,37 @@ class EmbeddingGenerator:
         Returns:
             List of embedding vectors
         """
-        embeddings = []
         task = task_type or self.task_type
         
-        # Process in batches
-        iterator = range(0, len(texts), self.batch_size)
-        if show_progress:
-            iterator = tqdm(iterator, desc="Generating embeddings")
+        # Split into batches and submit them concurrently
+        batches = [
+            (i // self.batch_size, texts[i:i + self.batch_size])
+            for i in range(0, len(texts), self.batch_size)
+        ]
+        batch_results = [None] * len(batches)
         
-        for i in iterator:
-            batch = texts[i:i + self.batch_size]
+        with ThreadPoolExecutor(max_workers=max(1, self.max_workers)) as executor:
+            futures = {
+                executor.submit(self._embed_batch, batch, task): (batch_index, batch)
+                for batch_index, batch in batches
+            }
             
-            try:
-                # Generate embeddings for batch
-                batch_embeddings = []
-                for text in batch:
-                    emb = self.generate_embedding(text, task)
-                    batch_embeddings.append(emb)
-                    
-                    # Small delay to avoid rate limiting
-                    time.sleep(0.1)
-                
-                embeddings.extend(batch_embeddings)
+            iterator = as_completed(futures)
+            if show_progress:
+                iterator = tqdm(iterator, total=len(futures), desc="Generating embeddings")
+            
+            for future in iterator:
+                batch_index, batch = futures[future]
+                try:
+                    batch_results[batch_index] = future.result()
                 
-            except Exception as e:
-                logger.error(f"Error in batch {i//self.batch_size}: {e}")
-                # Add zero vectors for failed batch
-                embeddings.extend([[0.0] * self.dimension] * len(batch))
+                except Exception as e:
+                    logger.error(f"Error in batch {batch_index}: {e}")
+                    # Add zero vectors for failed batch
+                    batch_results[batch_index] = [[0.0] * self.dimension for _ in batch]
+        
+        # Reassemble in input order
+        embeddings = [embedding for result in batch_results for embedding in result]
         
         logger.info(f"Generated {len(embeddings)} embeddings")
         return embeddings
@@ -135,14 +227,104 @@ class EmbeddingGenerator:
         logger.info("Embeddings attached to chunks")
         return chunks
     
+    def embed_chunks_array(
+        self,
+        chunks: List[Dict],
+        show_progress: bool = True
+    ) -> Tuple[List[Dict], np.ndarray]:
+        """
+        Generate embeddings for chunks as a single matrix of the configured dtype.
+        
+        Unlike embed_chunks, the chunks are left untouched; row i of the
+        matrix is the embedding of chunks[i].
+        
+        Args:
+            chunks: List of chunk dictionaries with 'text' field
+            show_progress: Show progress bar
+            
+        Returns:
+            Tuple of (chunks, embeddings array of shape [len(chunks), dimension])
+            with dtype float32, or float16 when configured to halve memory
+        """
+        logger.info(f"Embedding {len(chunks)} chunks")
+        
+        texts = [chunk['text'] for chunk in chunks]
+        embeddings = self.generate_embeddings_batch(
+            texts,
+            task_type='RETRIEVAL_DOCUMENT',
+            show_progress=show_progress
+        )
+        
+        if not embeddings:
+            return chunks, np.empty((0, self.dimension), dtype=self.dtype)
+        return chunks, np.asarray(embeddings, dtype=self.dtype)
+    
+    def embed_chunk_stream(
+        self,
+        chunks: Iterable[Dict],
+        window_size: int = None
+    ) -> Iterator[Tuple[List[Dict], np.ndarray]]:
+        """
+        Embed chunks from an iterable one window at a time.
+        
+        Only one window of chunks and embeddings is held in memory, so callers
+        can store each window before the next one is produced.
+        
+        Args:
+            chunks: Iterable of chunk dictionaries with 'text' field
+            window_size: Chunks per window (default: enough to keep all workers busy)
+            
+        Yields:
+            Tuples of (chunks, embeddings array) for each window
+        """
+        window_size = window_size or self.batch_size * max(1, self.max_workers)
+        chunk_iter = iter(chunks)
+        
+        while True:
+            window = list(islice(chunk_iter, window_size))
+            if not window:
+                return
+            yield self.embed_chunks_array(window, show_progress=False)
+    
     def embed_query(self, query: str) -> List[float]:
         """
         Generate embedding for a query.
         
+        Results are memoized per (model, query) for the life of the process.
+        
         Args:
             query: Query text
             
         Returns:
-            Query embedding vector
+            Query embedding vector; a zero vector if the query is empty or the
+            request fails
         """
-        return self.generate_embedding(query, task_type='RETRIEVAL_QUERY')
+        if not query.strip():
+            logger.warning("Empty text provided for embedding")
+            return [0.0] * self.dimension
+        
+        try:
+            # Failed calls raise and are therefore never cached
+            return list(_embed_query_cached(self.model_name, 'RETRIEVAL_QUERY', query))
+        
+        except Exception as e:
+            logger.error(f"Error generating query embedding: {e}")
+            return [0.0] * self.dimension
+    
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """
+        Generate embeddings for several queries with a single request.
+        
+        Args:
+            queries: Query texts
+            
+        Returns:
+            Query embedding vectors, aligned with the input; empty queries and
+            failed requests get zero vectors
+        """
+        try:
+            return self._embed_batch(queries, 'RETRIEVAL_QUERY')
+        
+        except Exception as e:
+            logger.error(f"Error generating query embeddings: {e}")
+            return [[0.0] * self.dimension for _ in queries]
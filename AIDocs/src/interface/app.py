@@ -61,41 +61,6 @@ st.markdown("""
         font-size: 1.1rem;
     }
     
-    /* Chat messages */
-    .user-message {
-        background: linear-gradient(135deg, #6366f1 0%, #8b5cf6 100%);
-        color: white;
-        padding: 1rem 1.5rem;
-        border-radius: 1rem 1rem 0.25rem 1rem;
-        margin: 1rem 0;
-        box-shadow: 0 4px 12px rgba(99, 102, 241, 0.2);
-    }
-    
-    .assistant-message {
-        background: #f8fafc;
-        color: #0f172a;
-        padding: 1rem 1.5rem;
-        border-radius: 1rem 1rem 1rem 0.25rem;
-        margin: 1rem 0;
-        border-left: 4px solid #6366f1;
-        box-shadow: 0 2px 8px rgba(0, 0, 0, 0.05);
-    }
-    
-    /* Citations */
-    .citation {
-        background: #eff6ff;
-        border-left: 3px solid #3b82f6;
-        padding: 0.75rem 1rem;
-        margin: 0.5rem 0;
-        border-radius: 0.5rem;
-        font-size: 0.9rem;
-    }
-    
-    .citation-title {
-        font-weight: 600;
-        color: #1e40af;
-    }
-    
     /* Stats cards */
     .stat-card {
         background: linear-gradient(135deg, #f8fafc 0%, #f1f5f9 100%);
@@ -164,11 +129,16 @@ if 'processed_files' not in st.session_state:
     st.session_state.processed_files = []
 
 
+@st.cache_resource(show_spinner="🚀 Initializing RAG Pipeline...")
+def get_pipeline():
+    """Create the RAG pipeline once and share it across reruns and sessions."""
+    return RAGPipeline()
+
+
 def initialize_pipeline():
-    """Initialize the RAG pipeline."""
+    """Attach the shared RAG pipeline to this session."""
     if st.session_state.pipeline is None:
-        with st.spinner("🚀 Initializing RAG Pipeline..."):
-            st.session_state.pipeline = RAGPipeline()
+        st.session_state.pipeline = get_pipeline()
         st.success("✅ Pipeline initialized!")
 
 
@@ -200,27 +170,18 @@ def process_uploaded_files(uploaded_files):
 
 def display_answer(result):
     """Display answer with citations."""
-    # Answer
-    st.markdown(f"""
-    <div class="assistant-message">
-        <strong>🤖 Answer:</strong><br><br>
-        {result['answer']}
-    </div>
-    """, unsafe_allow_html=True)
-    
-    # Citations
-    if result.get('citations'):
-        st.markdown("### 📚 Sources")
-        for citation in result['citations']:
-            similarity_pct = citation.get('similarity', 0) * 100
-            st.markdown(f"""
-            <div class="citation">
-                <div class="citation-title">📄 {citation['document_title']}</div>
-                <div style="color: #64748b; font-size: 0.85rem; margin-top: 0.25rem;">
-                    Page {citation['page_number']} • Relevance: {similarity_pct:.1f}%
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
+    with st.chat_message("assistant"):
+        st.markdown(result['answer'])
+        
+        # Citations stay collapsed so long histories don't expand every source list
+        if result.get('citations'):
+            with st.expander(f"📚 Sources ({len(result['citations'])})"):
+                for citation in result['citations']:
+                    similarity_pct = (citation.get('similarity') or 0) * 100
+                    st.markdown(
+                        f"**📄 {citation['document_title']}**  \n"
+                        f"Page {citation['page_number']} • Relevance: {similarity_pct:.1f}%"
+                    )
 
 
 # Main UI
@@ -297,12 +258,8 @@ def main():
         # Display chat history
         for message in st.session_state.chat_history:
             if message['role'] == 'user':
-                st.markdown(f"""
-                <div class="user-message">
-                    <strong>👤 You:</strong><br>
-                    {message['content']}
-                </div>
-                """, unsafe_allow_html=True)
+                with st.chat_message("user"):
+                    st.write(message['content'])
             else:
                 display_answer(message['content'])
         
@@ -1,11 +1,17 @@
 """Main orchestration for the RAG pipeline."""
+import atexit
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
+import os
+import threading
 from typing import List, Dict, Optional
-from src.utils import setup_logger, get_paths
+import numpy as np
+from src.utils import setup_logger, get_paths, get_settings, save_json, load_json, file_exists
 from src.pdf_extraction import PDFExtractor
 from src.chunking import TextChunker
 from src.embeddings import EmbeddingGenerator
-from src.vector_store import ChromaManager
+from src.vector_store import ChromaManager, FaissManager
 from src.qa_pipeline import HybridRetriever, AnswerGenerator
 
 logger = setup_logger(__name__)
@@ -22,18 +28,45 @@ class RAGPipeline:
         self.pdf_extractor = PDFExtractor()
         self.chunker = TextChunker()
         self.embedding_generator = EmbeddingGenerator()
-        self.chroma_manager = ChromaManager()
+        
+        # Vector store backend: ChromaDB by default, or a FAISS HNSW index
+        backend = get_settings().get('vector_store', {}).get('backend', 'chroma')
+        self.chroma_manager = FaissManager() if backend == 'faiss' else ChromaManager()
         self.retriever = HybridRetriever(self.chroma_manager)
         self.answer_generator = AnswerGenerator()
         
+        # Serializes vector store writes when PDFs are processed concurrently
+        self._store_lock = threading.Lock()
+        
+        # Answer cache: question -> {'top_k', 'result'}, plus question embeddings when
+        # near-duplicate (semantic) matching is on. Shared by all sessions using this
+        # pipeline, so every access holds _qa_cache_lock.
+        qa_cache_config = get_settings().get('qa_cache', {})
+        self.qa_cache_enabled = qa_cache_config.get('enabled', True)
+        self.qa_cache_semantic = qa_cache_config.get('semantic', False)
+        self.qa_cache_threshold = qa_cache_config.get('similarity_threshold', 0.95)
+        self.qa_cache_max_entries = qa_cache_config.get('max_entries', 256)
+        # New answers are written to disk in batches, and at exit
+        self.qa_cache_save_every = qa_cache_config.get('save_every', 16)
+        self.qa_cache_path = os.path.join(self.paths['cache_dir'], 'qa_cache.json')
+        self._qa_cache: Dict[str, Dict] = {}
+        self._query_embedding_cache: Dict[str, List[float]] = {}
+        self._qa_cache_lock = threading.Lock()
+        self._qa_cache_unsaved = 0
+        if self.qa_cache_enabled:
+            self._load_qa_cache()
+            atexit.register(self.flush_qa_cache)
+        
         logger.info("RAG Pipeline initialized successfully")
     
-    def process_pdf(self, pdf_path: str) -> Dict:
+    def process_pdf(self, pdf_path: str, parallel: bool = True) -> Dict:
         """
         Process a single PDF through the entire pipeline.
         
         Args:
             pdf_path: Path to PDF file
+            parallel: Allow OCR and chunking process pools for this PDF; turned
+                off when several PDFs are already processed concurrently
             
         Returns:
             Processing statistics
@@ -41,55 +74,227 @@ class RAGPipeline:
         logger.info(f"Processing PDF: {pdf_path}")
         
         # Extract text
-        extraction_result = self.pdf_extractor.process_pdf(pdf_path)
+        extraction_result = self.pdf_extractor.process_pdf(pdf_path, ocr_workers=None if parallel else 1)
         
-        # Chunk text
-        chunks = self.chunker.chunk_document_pages(
+        # Chunk, embed and store one window at a time to bound peak memory
+        chunk_stream = self.chunker.iter_document_chunks(
             extraction_result['pages'],
-            extraction_result['metadata']
+            extraction_result['metadata'],
+            parallel=parallel
         )
         
-        # Generate embeddings and add to vector store
-        self.chroma_manager.add_chunks(chunks)
+        num_chunks = 0
+        try:
+            for window, embeddings in self.embedding_generator.embed_chunk_stream(chunk_stream):
+                with self._store_lock:
+                    self.chroma_manager.add_chunks(window, embeddings=embeddings)
+                num_chunks += len(window)
+        finally:
+            # Persist what was added once per PDF, even if a later window failed
+            if num_chunks:
+                with self._store_lock:
+                    self.chroma_manager.flush()
+        
+        if num_chunks:
+            # New documents can change answers
+            self._clear_qa_cache()
         
         stats = {
             'filename': Path(pdf_path).name,
             'pages': extraction_result['statistics']['total_pages'],
-            'chunks': len(chunks),
+            'chunks': num_chunks,
             'characters': extraction_result['statistics']['total_characters']
         }
         
         logger.info(f"PDF processed: {stats}")
         return stats
     
-    def process_multiple_pdfs(self, pdf_paths: List[str]) -> List[Dict]:
+    def _process_pdf_safe(self, pdf_path: str, parallel: bool = True) -> Dict:
+        """Process a PDF, returning an error entry instead of raising."""
+        try:
+            return self.process_pdf(pdf_path, parallel=parallel)
+        except Exception as e:
+            logger.error(f"Error processing {pdf_path}: {e}")
+            return {
+                'filename': Path(pdf_path).name,
+                'error': str(e)
+            }
+    
+    def process_multiple_pdfs(self, pdf_paths: List[str], max_workers: int = 4) -> List[Dict]:
+        """
+        Process multiple PDFs concurrently.
+        
+        With more than one PDF in flight, each PDF is OCR'd and chunked in its
+        own thread without process pools, so the process count stays bounded and
+        nothing is forked from the busy threads.
+        
+        Args:
+            pdf_paths: List of PDF file paths
+            max_workers: Maximum number of PDFs processed at the same time
+            
+        Returns:
+            List of processing statistics, in the same order as pdf_paths
+        """
+        if not pdf_paths:
+            return []
+        
+        workers = max(1, min(max_workers, len(pdf_paths)))
+        if workers == 1:
+            return [self._process_pdf_safe(pdf_path) for pdf_path in pdf_paths]
+        
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(partial(self._process_pdf_safe, parallel=False), pdf_paths))
+    
+    def process_documents_batched(
+        self,
+        pdf_paths: List[str],
+        batch_size: int = 10,
+        max_workers: int = 4
+    ) -> List[Dict]:
         """
-        Process multiple PDFs.
+        Process PDFs in fixed-size batches to cap peak memory.
         
         Args:
             pdf_paths: List of PDF file paths
+            batch_size: Number of PDFs per batch
+            max_workers: Maximum number of PDFs processed at the same time within a batch
             
         Returns:
-            List of processing statistics
+            List of processing statistics, in the same order as pdf_paths
         """
         results = []
-        for pdf_path in pdf_paths:
-            try:
-                stats = self.process_pdf(pdf_path)
-                results.append(stats)
-            except Exception as e:
-                logger.error(f"Error processing {pdf_path}: {e}")
-                results.append({
-                    'filename': Path(pdf_path).name,
-                    'error': str(e)
-                })
+        for i in range(0, len(pdf_paths), batch_size):
+            batch = pdf_paths[i:i + batch_size]
+            logger.info(f"Processing batch {i//batch_size + 1}: {len(batch)} PDFs")
+            results.extend(self.process_multiple_pdfs(batch, max_workers=max_workers))
         
         return results
     
+    def _load_qa_cache(self) -> None:
+        """Load the persisted answer cache, if any."""
+        if not file_exists(self.qa_cache_path):
+            return
+        
+        try:
+            data = load_json(self.qa_cache_path)
+            self._qa_cache = data.get('answers', {})
+            self._query_embedding_cache = data.get('embeddings', {})
+            logger.info(f"Loaded {len(self._qa_cache)} cached answers")
+        except Exception as e:
+            logger.warning(f"Could not load answer cache {self.qa_cache_path}: {e}")
+            self._qa_cache = {}
+            self._query_embedding_cache = {}
+    
+    def _save_qa_cache(self) -> None:
+        """Persist the answer cache so it survives restarts (caller holds _qa_cache_lock)."""
+        try:
+            save_json({
+                'answers': self._qa_cache,
+                'embeddings': self._query_embedding_cache
+            }, self.qa_cache_path)
+            self._qa_cache_unsaved = 0
+        except Exception as e:
+            logger.warning(f"Could not save answer cache {self.qa_cache_path}: {e}")
+    
+    def flush_qa_cache(self) -> None:
+        """Write answers cached since the last save to disk."""
+        with self._qa_cache_lock:
+            if self._qa_cache_unsaved:
+                self._save_qa_cache()
+    
+    def _clear_qa_cache(self) -> None:
+        """Drop all cached answers."""
+        with self._qa_cache_lock:
+            if not self._qa_cache:
+                return
+            
+            self._qa_cache = {}
+            self._query_embedding_cache = {}
+            self._save_qa_cache()
+        logger.info("Answer cache cleared")
+    
+    def _lookup_cached_answer(
+        self,
+        question: str,
+        question_embedding: Optional[List[float]],
+        top_k: int
+    ) -> Optional[Dict]:
+        """
+        Find a cached answer for the same or a near-duplicate question.
+        
+        Args:
+            question: User question
+            question_embedding: Embedding of the question, or None to match
+                the exact question only
+            top_k: Number of chunks the answer must have been retrieved with
+            
+        Returns:
+            Cached answer dictionary, or None on a miss
+        """
+        with self._qa_cache_lock:
+            entry = self._qa_cache.get(question)
+            if entry and entry['top_k'] == top_k:
+                return entry['result']
+            
+            if question_embedding is None:
+                return None
+            
+            candidates = [
+                q for q, e in self._qa_cache.items()
+                if e['top_k'] == top_k and q in self._query_embedding_cache
+            ]
+            if not candidates:
+                return None
+            
+            embeddings = [self._query_embedding_cache[q] for q in candidates]
+        
+        # Cosine similarity against all cached questions in one matrix product
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        query = np.asarray(question_embedding, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+        norms[norms == 0] = np.inf
+        similarities = (matrix @ query) / norms
+        
+        best = int(np.argmax(similarities))
+        if similarities[best] >= self.qa_cache_threshold:
+            with self._qa_cache_lock:
+                entry = self._qa_cache.get(candidates[best])
+            if entry is not None:
+                logger.info(f"Answer cache hit: '{candidates[best]}' (similarity {similarities[best]:.3f})")
+                return entry['result']
+        
+        return None
+    
+    def _store_cached_answer(
+        self,
+        question: str,
+        question_embedding: Optional[List[float]],
+        top_k: int,
+        result: Dict
+    ) -> None:
+        """Add an answer to the cache, evicting the oldest entries past the size limit."""
+        with self._qa_cache_lock:
+            self._qa_cache.pop(question, None)
+            self._qa_cache[question] = {'top_k': top_k, 'result': result}
+            if question_embedding is not None:
+                self._query_embedding_cache[question] = list(question_embedding)
+            
+            while len(self._qa_cache) > self.qa_cache_max_entries:
+                oldest = next(iter(self._qa_cache))
+                del self._qa_cache[oldest]
+                self._query_embedding_cache.pop(oldest, None)
+            
+            self._qa_cache_unsaved += 1
+            if self._qa_cache_unsaved >= self.qa_cache_save_every:
+                self._save_qa_cache()
+    
     def ask_question(self, question: str, top_k: int = 8) -> Dict:
         """
         Answer a question using the RAG pipeline.
         
+        Repeated questions (and, with qa_cache.semantic on, near-duplicates)
+        are answered from the answer cache without retrieval or generation.
+        
         Args:
             question: User question
             top_k: Number of chunks to retrieve
@@ -99,6 +304,14 @@ class RAGPipeline:
         """
         logger.info(f"Answering question: {question}")
         
+        question_embedding = None
+        if self.qa_cache_enabled:
+            if self.qa_cache_semantic:
+                question_embedding = self.embedding_generator.embed_query(question)
+            cached = self._lookup_cached_answer(question, question_embedding, top_k)
+            if cached is not None:
+                return {**cached, 'question': question}
+        
         # Retrieve relevant chunks
         retrieved_chunks = self.retriever.retrieve(question, top_k=top_k)
         
@@ -113,6 +326,9 @@ class RAGPipeline:
         # Generate answer
         answer_result = self.answer_generator.answer_question(question, retrieved_chunks)
         
+        if self.qa_cache_enabled and 'error' not in answer_result:
+            self._store_cached_answer(question, question_embedding, top_k, answer_result)
+        
         return answer_result
     
     def get_stats(self) -> Dict:
@@ -126,11 +342,14 @@ class RAGPipeline:
     def clear_database(self) -> None:
         """Clear all data from the vector database."""
         self.chroma_manager.clear_collection()
+        self._clear_qa_cache()
         logger.info("Database cleared")
     
     def cleanup(self) -> None:
         """Clean up temporary files."""
         self.pdf_extractor.cleanup()
+        if self.qa_cache_enabled:
+            self.flush_qa_cache()
         logger.info("Cleanup completed")
 
 
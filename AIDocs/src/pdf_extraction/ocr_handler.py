@@ -1,14 +1,93 @@
 """OCR handler for processing images and scanned PDFs."""
 import os
-from pathlib import Path
-from typing import List, Optional
+import shutil
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import chain
+from typing import Callable, Iterator, List, Optional, Union
+import numpy as np
 from PIL import Image
 import pytesseract
-from pdf2image import convert_from_path
+import pymupdf
 from src.utils import setup_logger, get_settings, ensure_dir
 
 logger = setup_logger(__name__)
 
+# Threshold used when a page has no usable contrast (e.g. blank pages)
+_DEFAULT_THRESHOLD = 128
+_GRAY_LEVELS = np.arange(256, dtype=np.float64)
+
+
+def otsu_threshold(image: Image.Image) -> int:
+    """
+    Compute Otsu's threshold for a grayscale image.
+    
+    Picks the level that maximizes the between-class variance of the histogram,
+    evaluating all 256 candidates at once with cumulative sums.
+    
+    Args:
+        image: Grayscale ('L') PIL Image
+    
+    Returns:
+        Threshold t; pixels above t are foreground (white)
+    """
+    return _otsu_from_histogram(np.asarray(image.histogram(), dtype=np.float64))
+
+
+def _otsu_from_histogram(hist: np.ndarray) -> int:
+    """Otsu's threshold for a 256-bin gray-level histogram."""
+    total = hist.sum()
+    
+    # omega[t] = pixels at or below t, mu[t] = sum of their gray levels
+    omega = np.cumsum(hist)
+    mu = np.cumsum(hist * _GRAY_LEVELS)
+    
+    denominator = omega * (total - omega)
+    numerator = (mu[-1] * omega - mu * total) ** 2
+    between_variance = np.divide(
+        numerator, denominator, out=np.zeros_like(numerator), where=denominator > 0
+    )
+    
+    if not between_variance.any():
+        return _DEFAULT_THRESHOLD
+    return int(np.argmax(between_variance))
+
+
+def binarize_image(image: Image.Image) -> Image.Image:
+    """Convert an image to black and white for OCR."""
+    # Convert to grayscale
+    image = image.convert('L')
+    hist = np.asarray(image.histogram(), dtype=np.float64)
+    
+    # Already binary (e.g. bilevel scans): nothing to threshold
+    if np.count_nonzero(hist) <= 2:
+        return image
+    
+    # Threshold at the Otsu level, applied by PIL in C via a lookup table
+    threshold = _otsu_from_histogram(hist)
+    return image.point([0] * (threshold + 1) + [255] * (255 - threshold))
+
+
+def ocr_page(image: Image.Image, lang: str, preprocessing: bool, config: str = '') -> str:
+    """
+    OCR a single page image.
+    
+    Defined at module level so it can run in a worker process.
+    
+    Args:
+        image: Page image
+        lang: Tesseract language
+        preprocessing: Whether to binarize the image first
+        config: Extra Tesseract command-line options
+    
+    Returns:
+        Extracted text
+    """
+    if preprocessing:
+        image = binarize_image(image)
+    return pytesseract.image_to_string(image, lang=lang, config=config)
+
 
 class OCRHandler:
     """Handle OCR processing for images and scanned PDFs."""
@@ -18,7 +97,8 @@ class OCRHandler:
         Initialize OCR handler.
         
         Args:
-            temp_dir: Directory for temporary image storage
+            temp_dir: Scratch directory for image files; PDF pages are OCR'd
+                in memory and never written here
         """
         self.temp_dir = temp_dir
         ensure_dir(temp_dir)
@@ -27,9 +107,19 @@ class OCRHandler:
         settings = get_settings()
         self.ocr_config = settings.get('ocr', {})
         self.language = self.ocr_config.get('language', 'eng')
-        self.dpi = self.ocr_config.get('dpi', 300)
+        self.dpi = self.ocr_config.get('dpi', 200)
         self.preprocessing = self.ocr_config.get('preprocessing', True)
         
+        # LSTM engine, one uniform text block per page; orientation is detected
+        # once per document instead of by Tesseract's page analysis
+        self.tesseract_config = self.ocr_config.get(
+            'tesseract_config', '--oem 1 --psm 6 -c preserve_interword_spaces=1'
+        )
+        self.detect_orientation = self.ocr_config.get('detect_orientation', True)
+        
+        # Pages OCR'd in parallel worker processes (0 = one per CPU)
+        self.max_workers = self.ocr_config.get('max_workers', 0) or os.cpu_count() or 1
+        
         logger.info(f"OCR Handler initialized with language={self.language}, dpi={self.dpi}")
     
     def preprocess_image(self, image: Image.Image) -> Image.Image:
@@ -38,109 +128,169 @@ class OCRHandler:
         
         Args:
             image: PIL Image object
-            
+        
         Returns:
             Preprocessed image
         """
         if not self.preprocessing:
             return image
         
-        # Convert to grayscale
-        image = image.convert('L')
-        
-        # Enhance contrast (simple thresholding)
-        # This can be improved with more sophisticated preprocessing
-        threshold = 128
-        image = image.point(lambda p: p > threshold and 255)
-        
-        return image
+        return binarize_image(image)
     
-    def extract_text_from_image(self, image_path: str) -> str:
+    def extract_text_from_image(self, image: Union[str, Image.Image]) -> str:
         """
         Extract text from a single image using OCR.
         
         Args:
-            image_path: Path to image file
-            
+            image: Path to image file, or an already loaded PIL Image
+        
         Returns:
             Extracted text
         """
+        source = image if isinstance(image, str) else 'in-memory image'
         try:
-            image = Image.open(image_path)
-            
-            if self.preprocessing:
-                image = self.preprocess_image(image)
+            # Rendered PDF pages arrive as images; only files on disk are opened here
+            if isinstance(image, str):
+                with Image.open(image) as opened:
+                    text = ocr_page(opened, self.language, self.preprocessing, self.tesseract_config)
+            else:
+                text = ocr_page(image, self.language, self.preprocessing, self.tesseract_config)
             
-            # Perform OCR
-            text = pytesseract.image_to_string(image, lang=self.language)
-            
-            logger.debug(f"Extracted {len(text)} characters from {image_path}")
+            logger.debug(f"Extracted {len(text)} characters from {source}")
             return text
         
         except Exception as e:
-            logger.error(f"Error extracting text from image {image_path}: {e}")
+            logger.error(f"Error extracting text from image {source}: {e}")
             return ""
     
-    def pdf_to_images(self, pdf_path: str) -> List[str]:
+    def pdf_to_images(self, pdf_path: str) -> Iterator[Image.Image]:
         """
-        Convert PDF pages to images.
+        Render PDF pages to images one at a time.
+        
+        Each page is rasterized with PyMuPDF only when requested, so at most one
+        page image is held in memory and nothing is written to disk.
         
         Args:
             pdf_path: Path to PDF file
-            
+        
+        Yields:
+            One RGB PIL Image per page, in page order
+        """
+        try:
+            with pymupdf.open(pdf_path) as doc:
+                for page in doc:
+                    pix = page.get_pixmap(dpi=self.dpi)
+                    yield Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+                
+                logger.info(f"Rendered {doc.page_count} pages from {pdf_path}")
+        
+        except Exception as e:
+            logger.error(f"Error converting PDF to images: {e}")
+    
+    def detect_rotation(self, image: Image.Image) -> int:
+        """
+        Detect how far a page must be rotated clockwise to be upright.
+        
+        Args:
+            image: Page image
+        
         Returns:
-            List of image file paths
+            Rotation in degrees (0, 90, 180 or 270); 0 if detection fails
         """
         try:
-            # Convert PDF to images
-            images = convert_from_path(pdf_path, dpi=self.dpi)
-            
-            image_paths = []
-            pdf_name = Path(pdf_path).stem
-            
-            for i, image in enumerate(images):
-                image_path = os.path.join(self.temp_dir, f"{pdf_name}_page_{i+1}.png")
-                image.save(image_path, 'PNG')
-                image_paths.append(image_path)
+            osd = pytesseract.image_to_osd(image, output_type=pytesseract.Output.DICT)
+            return int(osd.get('rotate', 0)) % 360
+        except Exception as e:
+            logger.debug(f"Orientation detection failed, assuming upright pages: {e}")
+            return 0
+    
+    def _oriented_pages(self, pdf_path: str) -> Iterator[Image.Image]:
+        """Render PDF pages, rotating all of them by the first page's orientation."""
+        pages = self.pdf_to_images(pdf_path)
+        first = next(pages, None)
+        if first is None:
+            return
+        
+        rotation = self.detect_rotation(first) if self.detect_orientation else 0
+        if rotation:
+            logger.info(f"Rotating pages of {pdf_path} by {rotation} degrees")
+        
+        # PIL rotates counterclockwise, OSD reports the clockwise correction
+        for image in chain([first], pages):
+            yield image.rotate(-rotation, expand=True) if rotation else image
+    
+    def iter_text_from_pdf_ocr(self, pdf_path: str, max_workers: Optional[int] = None) -> Iterator[dict]:
+        """
+        Lazily OCR a PDF, one page at a time.
+        
+        With max_workers > 1, pages are OCR'd in a process pool. Only a small
+        window of rendered pages is in flight, so memory stays bounded.
+        
+        Args:
+            pdf_path: Path to PDF file
+            max_workers: OCR processes for this PDF (defaults to self.max_workers)
+        
+        Yields:
+            Dictionaries with page number and text, in page order
+        """
+        max_workers = max_workers or self.max_workers
+        if max_workers <= 1:
+            for i, image in enumerate(self._oriented_pages(pdf_path)):
+                yield self._ocr_result(i + 1, partial(
+                    ocr_page, image, self.language, self.preprocessing, self.tesseract_config
+                ))
+            return
+        
+        page_number = 0
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            pending = deque()
+            for image in self._oriented_pages(pdf_path):
+                pending.append(executor.submit(
+                    ocr_page, image, self.language, self.preprocessing, self.tesseract_config
+                ))
+                
+                # Keep every worker busy without rendering the whole document ahead
+                if len(pending) >= max_workers * 2:
+                    page_number += 1
+                    yield self._ocr_result(page_number, pending.popleft().result)
             
-            logger.info(f"Converted {len(images)} pages from {pdf_path} to images")
-            return image_paths
+            while pending:
+                page_number += 1
+                yield self._ocr_result(page_number, pending.popleft().result)
+    
+    def _ocr_result(self, page_number: int, get_text: Callable[[], str]) -> dict:
+        """
+        Run or wait for a page's OCR and build its page dictionary.
         
+        Failed pages get empty text and an 'error' entry, so callers can tell
+        them apart from genuinely blank pages.
+        """
+        page = {
+            'page_number': page_number,
+            'text': "",
+            'method': 'ocr'
+        }
+        try:
+            page['text'] = get_text()
+            logger.debug(f"Extracted {len(page['text'])} characters from page {page_number}")
         except Exception as e:
-            logger.error(f"Error converting PDF to images: {e}")
-            return []
+            logger.error(f"Error extracting text from page {page_number}: {e}")
+            page['error'] = str(e)
+        
+        return page
     
-    def extract_text_from_pdf_ocr(self, pdf_path: str) -> List[dict]:
+    def extract_text_from_pdf_ocr(self, pdf_path: str, max_workers: Optional[int] = None) -> List[dict]:
         """
         Extract text from PDF using OCR (for scanned PDFs).
         
         Args:
             pdf_path: Path to PDF file
-            
+            max_workers: OCR processes for this PDF (defaults to self.max_workers)
+        
         Returns:
             List of dictionaries with page number and text
         """
-        # Convert PDF to images
-        image_paths = self.pdf_to_images(pdf_path)
-        
-        if not image_paths:
-            return []
-        
-        # Extract text from each image
-        results = []
-        for i, image_path in enumerate(image_paths):
-            text = self.extract_text_from_image(image_path)
-            results.append({
-                'page_number': i + 1,
-                'text': text,
-                'method': 'ocr'
-            })
-            
-            # Clean up temporary image
-            try:
-                os.remove(image_path)
-            except Exception as e:
-                logger.warning(f"Could not remove temporary image {image_path}: {e}")
+        results = list(self.iter_text_from_pdf_ocr(pdf_path, max_workers))
         
         logger.info(f"OCR extraction completed for {pdf_path}: {len(results)} pages")
         return results
@@ -148,10 +298,9 @@ class OCRHandler:
     def cleanup(self) -> None:
         """Clean up temporary files."""
         try:
-            for file in os.listdir(self.temp_dir):
-                file_path = os.path.join(self.temp_dir, file)
-                if os.path.isfile(file_path):
-                    os.remove(file_path)
+            # Drop the whole directory in one call rather than deleting file by file
+            shutil.rmtree(self.temp_dir, ignore_errors=True)
+            ensure_dir(self.temp_dir)
             logger.info("Temporary OCR files cleaned up")
         except Exception as e:
             logger.error(f"Error cleaning up temporary files: {e}")
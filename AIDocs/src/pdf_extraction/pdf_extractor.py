@@ -1,15 +1,81 @@
 """PDF text extraction with OCR fallback."""
+import hashlib
 import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import List, Dict, Iterator, Optional
 import pdfplumber
-from PyPDF2 import PdfReader
-from src.utils import setup_logger, get_paths, save_json, ensure_dir
+from src.utils import setup_logger, get_paths, get_settings, save_json, load_json, ensure_dir, file_exists
 from .ocr_handler import OCRHandler
 
 logger = setup_logger(__name__)
 
 
+def _file_key(pdf_path: str, options: str = '') -> str:
+    """Identify a PDF by its path, modification time and size, plus any extraction options."""
+    stat = os.stat(pdf_path)
+    key = f"{os.path.abspath(pdf_path)}:{stat.st_mtime_ns}:{stat.st_size}:{options}"
+    return hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+
+
+def _sample_indices(total: int, sample_size: int) -> List[int]:
+    """Evenly spaced page indices across a document, all of them if sample_size is 0 or covers it."""
+    if not sample_size or sample_size >= total:
+        return list(range(total))
+    return [i * total // sample_size for i in range(sample_size)]
+
+
+def _is_saved_copy(output_path: str, cache_path: str) -> bool:
+    """Whether output_path was written from the cache entry: same size and not older."""
+    try:
+        output_stat = os.stat(output_path)
+        cache_stat = os.stat(cache_path)
+    except OSError:
+        return False
+    return output_stat.st_size == cache_stat.st_size and output_stat.st_mtime_ns >= cache_stat.st_mtime_ns
+
+
+def _metadata_from_pdf(pdf, pdf_path: str) -> Dict:
+    """Build the document metadata dictionary from an open pdfplumber PDF."""
+    metadata = pdf.metadata or {}
+    
+    # Convert metadata to serializable format
+    def convert_value(val):
+        """Convert pdfminer values to serializable types."""
+        if val is None:
+            return None
+        if isinstance(val, bytes):
+            return val.decode('utf-8', errors='replace')
+        return str(val)
+    
+    return {
+        'title': convert_value(metadata.get('Title')) or Path(pdf_path).stem,
+        'author': convert_value(metadata.get('Author')) or 'Unknown',
+        'pages': len(pdf.pages),
+        'filename': Path(pdf_path).name,
+        'filepath': pdf_path
+    }
+
+
+def _fallback_metadata(pdf_path: str) -> Dict:
+    """Metadata used when the PDF can't be parsed."""
+    return {
+        'title': Path(pdf_path).stem,
+        'author': 'Unknown',
+        'pages': 0,
+        'filename': Path(pdf_path).name,
+        'filepath': pdf_path
+    }
+
+
+@lru_cache(maxsize=256)
+def _read_pdf_metadata(pdf_path: str, file_key: str) -> Dict:
+    """Read PDF metadata; file_key only invalidates the cache when the file changes."""
+    with pdfplumber.open(pdf_path) as pdf:
+        return _metadata_from_pdf(pdf, pdf_path)
+
+
 class PDFExtractor:
     """Extract text from PDFs using pdfplumber with OCR fallback."""
     
@@ -18,6 +84,18 @@ class PDFExtractor:
         self.paths = get_paths()
         self.ocr_handler = OCRHandler(self.paths['temp_images_dir'])
         ensure_dir(self.paths['extracted_texts_dir'])
+        
+        settings = get_settings()
+        
+        # Pages checked to decide whether a PDF needs OCR (0 = all pages)
+        self.ocr_sample_pages = settings.get('ocr', {}).get('sample_pages', 10)
+        
+        # Extraction results of unchanged PDFs are reused from disk
+        cache_config = settings.get('extraction_cache', {})
+        self.cache_enabled = cache_config.get('enabled', True)
+        self.cache_dir = os.path.join(self.paths['cache_dir'], 'extractions')
+        if self.cache_enabled:
+            ensure_dir(self.cache_dir)
         logger.info("PDF Extractor initialized")
     
     def get_pdf_metadata(self, pdf_path: str) -> Dict:
@@ -31,33 +109,41 @@ class PDFExtractor:
             Dictionary with metadata
         """
         try:
-            reader = PdfReader(pdf_path)
-            metadata = reader.metadata or {}
-            
-            # Convert metadata to serializable format
-            def convert_value(val):
-                """Convert PyPDF2 objects to serializable types."""
-                if val is None:
-                    return None
-                # Convert to string to handle IndirectObject and other PyPDF2 types
-                return str(val)
-            
-            return {
-                'title': convert_value(metadata.get('/Title')) or Path(pdf_path).stem,
-                'author': convert_value(metadata.get('/Author')) or 'Unknown',
-                'pages': len(reader.pages),
-                'filename': Path(pdf_path).name,
-                'filepath': pdf_path
-            }
+            return dict(_read_pdf_metadata(pdf_path, _file_key(pdf_path)))
         except Exception as e:
             logger.error(f"Error extracting metadata from {pdf_path}: {e}")
-            return {
-                'title': Path(pdf_path).stem,
-                'author': 'Unknown',
-                'pages': 0,
-                'filename': Path(pdf_path).name,
-                'filepath': pdf_path
-            }
+            return _fallback_metadata(pdf_path)
+    
+    def iter_pages(self, pdf_path: str) -> Iterator[Dict]:
+        """
+        Lazily extract text page by page using pdfplumber.
+        
+        Args:
+            pdf_path: Path to PDF file
+            
+        Yields:
+            Dictionaries with page number and text
+        """
+        with pdfplumber.open(pdf_path) as pdf:
+            yield from self._iter_pdf_pages(pdf)
+    
+    def _iter_pdf_pages(self, pdf) -> Iterator[Dict]:
+        """Yield page dictionaries from an open pdfplumber PDF."""
+        for i in range(len(pdf.pages)):
+            yield self._extract_pdf_page(pdf, i)
+    
+    @staticmethod
+    def _extract_pdf_page(pdf, index: int) -> Dict:
+        """Extract one page dictionary from an open pdfplumber PDF."""
+        page = pdf.pages[index]
+        result = {
+            'page_number': index + 1,
+            'text': page.extract_text() or "",
+            'method': 'pdfplumber'
+        }
+        # Drop the parsed page objects once the text is extracted
+        page.flush_cache()
+        return result
     
     def extract_with_pdfplumber(self, pdf_path: str) -> List[Dict]:
         """
@@ -69,17 +155,8 @@ class PDFExtractor:
         Returns:
             List of dictionaries with page number and text
         """
-        results = []
-        
         try:
-            with pdfplumber.open(pdf_path) as pdf:
-                for i, page in enumerate(pdf.pages):
-                    text = page.extract_text() or ""
-                    results.append({
-                        'page_number': i + 1,
-                        'text': text,
-                        'method': 'pdfplumber'
-                    })
+            results = list(self.iter_pages(pdf_path))
             
             logger.info(f"Extracted text from {len(results)} pages using pdfplumber")
             return results
@@ -111,31 +188,62 @@ class PDFExtractor:
         
         return needs_ocr
     
-    def extract_text(self, pdf_path: str, force_ocr: bool = False) -> Dict:
+    def extract_text(self, pdf_path: str, force_ocr: bool = False, ocr_workers: Optional[int] = None) -> Dict:
         """
         Extract text from PDF with automatic OCR fallback.
         
         Args:
             pdf_path: Path to PDF file
             force_ocr: Force OCR even if text extraction works
+            ocr_workers: OCR processes for this PDF (defaults to ocr.max_workers)
             
         Returns:
             Dictionary with metadata and extracted pages
         """
         logger.info(f"Processing PDF: {pdf_path}")
         
-        # Get metadata
-        metadata = self.get_pdf_metadata(pdf_path)
-        
-        # Try pdfplumber first
+        # Open the PDF once for both metadata and text
+        metadata = None
         pages = []
-        if not force_ocr:
-            pages = self.extract_with_pdfplumber(pdf_path)
+        use_ocr = force_ocr
+        errors = []
+        try:
+            with pdfplumber.open(pdf_path) as pdf:
+                metadata = _metadata_from_pdf(pdf, pdf_path)
+                
+                # Try pdfplumber first
+                if not force_ocr:
+                    # Decide on OCR from pages spread across the document, so scanned
+                    # PDFs aren't parsed in full and a text cover page can't mislead it
+                    total = len(pdf.pages)
+                    sampled = {
+                        i: self._extract_pdf_page(pdf, i)
+                        for i in _sample_indices(total, self.ocr_sample_pages)
+                    }
+                    use_ocr = self.needs_ocr(list(sampled.values()))
+                    if not use_ocr:
+                        pages = [
+                            sampled[i] if i in sampled else self._extract_pdf_page(pdf, i)
+                            for i in range(total)
+                        ]
+                        logger.info(f"Extracted text from {len(pages)} pages using pdfplumber")
+        except Exception as e:
+            logger.error(f"Error extracting with pdfplumber: {e}")
+            errors.append(f"pdfplumber: {e}")
+            pages = []
+            use_ocr = True
+        
+        if metadata is None:
+            metadata = _fallback_metadata(pdf_path)
         
         # Use OCR if needed
-        if force_ocr or self.needs_ocr(pages):
+        if use_ocr:
             logger.info("Using OCR for text extraction")
-            pages = self.ocr_handler.extract_text_from_pdf_ocr(pdf_path)
+            pages = self.ocr_handler.extract_text_from_pdf_ocr(pdf_path, max_workers=ocr_workers)
+            errors.extend(f"page {page['page_number']}: {page['error']}" for page in pages if 'error' in page)
+            # Rendering stops at the first broken page
+            if len(pages) < metadata['pages']:
+                errors.append(f"OCR rendered {len(pages)} of {metadata['pages']} pages")
         
         # Calculate statistics
         total_chars = sum(len(page['text']) for page in pages)
@@ -146,40 +254,85 @@ class PDFExtractor:
             'statistics': {
                 'total_pages': len(pages),
                 'total_characters': total_chars,
-                'extraction_method': pages[0]['method'] if pages else 'none'
+                'extraction_method': pages[0]['method'] if pages else 'none',
+                'errors': errors
             }
         }
         
         logger.info(f"Extraction complete: {len(pages)} pages, {total_chars} characters")
         return result
     
-    def process_pdf(self, pdf_path: str, save_output: bool = True) -> Dict:
+    def _cache_options(self, force_ocr: bool) -> str:
+        """Settings that change the extracted text, as part of the cache key."""
+        ocr = self.ocr_handler
+        return (
+            f"{force_ocr}:{self.ocr_sample_pages}:{ocr.language}:{ocr.dpi}:"
+            f"{ocr.preprocessing}:{ocr.detect_orientation}:{ocr.tesseract_config}"
+        )
+    
+    def process_pdf(
+        self,
+        pdf_path: str,
+        save_output: bool = True,
+        force_ocr: bool = False,
+        ocr_workers: Optional[int] = None
+    ) -> Dict:
         """
         Process a PDF file and optionally save the output.
         
+        Results are cached by file path, modification time, size and the
+        extraction/OCR settings, so unchanged PDFs are not extracted again.
+        Empty or failed extractions are never cached.
+        
         Args:
             pdf_path: Path to PDF file
             save_output: Whether to save extracted text to JSON
+            force_ocr: Force OCR even if text extraction works
+            ocr_workers: OCR processes for this PDF (defaults to ocr.max_workers)
             
         Returns:
             Extraction result dictionary
         """
-        result = self.extract_text(pdf_path)
+        cache_path = None
+        if self.cache_enabled:
+            try:
+                cache_key = _file_key(pdf_path, self._cache_options(force_ocr))
+                cache_path = os.path.join(self.cache_dir, f"{cache_key}.json")
+            except OSError as e:
+                logger.warning(f"Could not stat {pdf_path} for the extraction cache: {e}")
+        
+        cache_hit = bool(cache_path) and file_exists(cache_path)
+        if cache_hit:
+            logger.info(f"Using cached extraction for {pdf_path}")
+            result = load_json(cache_path)
+        else:
+            result = self.extract_text(pdf_path, force_ocr=force_ocr, ocr_workers=ocr_workers)
+            statistics = result['statistics']
+            if statistics['errors'] or not statistics['total_characters']:
+                logger.warning(f"Not caching extraction of {pdf_path}: no text or errors during extraction")
+            elif cache_path:
+                save_json(result, cache_path)
         
         if save_output:
             output_filename = Path(pdf_path).stem + '_extracted.json'
             output_path = os.path.join(self.paths['extracted_texts_dir'], output_filename)
-            save_json(result, output_path)
-            logger.info(f"Saved extraction result to {output_path}")
+            if cache_hit and _is_saved_copy(output_path, cache_path):
+                logger.info(f"Extraction result already saved to {output_path}")
+            else:
+                save_json(result, output_path)
+                logger.info(f"Saved extraction result to {output_path}")
         
         return result
     
-    def process_directory(self, directory: str = None) -> List[Dict]:
+    def process_directory(self, directory: str = None, max_workers: int = None) -> List[Dict]:
         """
         Process all PDFs in a directory.
         
+        PDFs are extracted in parallel worker processes, one PDF per worker.
+        
         Args:
             directory: Directory path (defaults to raw_pdfs_dir)
+            max_workers: Maximum number of worker processes (defaults to the CPU count)
             
         Returns:
             List of extraction results
@@ -187,20 +340,37 @@ class PDFExtractor:
         if directory is None:
             directory = self.paths['raw_pdfs_dir']
         
-        pdf_files = list(Path(directory).glob('*.pdf'))
+        pdf_files = [str(pdf_path) for pdf_path in Path(directory).glob('*.pdf')]
         logger.info(f"Found {len(pdf_files)} PDF files in {directory}")
         
-        results = []
-        for pdf_path in pdf_files:
-            try:
-                result = self.process_pdf(str(pdf_path))
-                results.append(result)
-            except Exception as e:
-                logger.error(f"Error processing {pdf_path}: {e}")
+        workers = min(max_workers or os.cpu_count() or 1, len(pdf_files))
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                extracted = list(executor.map(_process_pdf_worker, pdf_files))
+        else:
+            extracted = [self._process_pdf_safe(pdf_path) for pdf_path in pdf_files]
+        
+        results = [result for result in extracted if result is not None]
         
         logger.info(f"Processed {len(results)} PDFs successfully")
         return results
     
+    def _process_pdf_safe(self, pdf_path: str) -> Optional[Dict]:
+        """Process a PDF, logging and returning None on failure."""
+        try:
+            return self.process_pdf(pdf_path)
+        except Exception as e:
+            logger.error(f"Error processing {pdf_path}: {e}")
+            return None
+    
     def cleanup(self) -> None:
         """Clean up temporary files."""
         self.ocr_handler.cleanup()
+
+
+def _process_pdf_worker(pdf_path: str) -> Optional[Dict]:
+    """Process one PDF in a worker process (top-level so it can be pickled)."""
+    extractor = PDFExtractor()
+    # Files are already processed in parallel, so OCR each file's pages serially
+    extractor.ocr_handler.max_workers = 1
+    return extractor._process_pdf_safe(pdf_path)
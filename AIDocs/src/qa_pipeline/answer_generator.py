@@ -1,10 +1,33 @@
 """Answer generation using Gemini LLM."""
-from typing import List, Dict, Tuple
+import hashlib
+import os
+import sqlite3
+from contextlib import closing
+from typing import List, Dict, Optional, Tuple
 import google.generativeai as genai
-from src.utils import setup_logger, get_model_config, get_api_key, load_env
+from src.utils import setup_logger, get_model_config, get_api_key, load_env, get_settings, get_paths, ensure_dir
+from src.qa_pipeline.retriever import HybridRetriever
 
 logger = setup_logger(__name__)
 
+# Answer prompt; only the context and question slots are filled per request
+_PROMPT_TEMPLATE = """You are a helpful AI assistant that answers questions based on provided document context.
+
+INSTRUCTIONS:
+1. Answer the question using ONLY the information from the provided context
+2. If the answer is not in the context, say "I cannot answer this question based on the provided documents"
+3. Include specific page citations in your answer using the format [Source X, Page Y]
+4. Be detailed and comprehensive in your answer
+5. Quote relevant parts of the context when appropriate
+6. Do not make up information or use external knowledge
+
+CONTEXT:
+{context}
+
+QUESTION: {question}
+
+ANSWER:"""
+
 
 class AnswerGenerator:
     """Generate grounded answers using Gemini LLM."""
@@ -26,8 +49,26 @@ class AnswerGenerator:
         self.top_p = llm_config.get('top_p', 0.95)
         self.top_k = llm_config.get('top_k', 40)
         
+        # Generation settings never change, so build them once and bake them into the model
+        self.generation_config = genai.types.GenerationConfig(
+            temperature=self.temperature,
+            max_output_tokens=self.max_tokens,
+            top_p=self.top_p,
+            top_k=self.top_k
+        )
+        
         # Initialize model
-        self.model = genai.GenerativeModel(self.model_name)
+        self.model = genai.GenerativeModel(self.model_name, generation_config=self.generation_config)
+        
+        # Generated answers cached on disk by (model settings, question, context)
+        answer_cache_config = get_settings().get('answer_cache', {})
+        self.cache_enabled = answer_cache_config.get('enabled', True)
+        cache_dir = get_paths()['cache_dir']
+        self.cache_path = os.path.join(cache_dir, 'answers.sqlite')
+        if self.cache_enabled:
+            ensure_dir(cache_dir)
+            with closing(sqlite3.connect(self.cache_path)) as conn, conn:
+                conn.execute("CREATE TABLE IF NOT EXISTS answers (key TEXT PRIMARY KEY, answer TEXT NOT NULL)")
         
         logger.info(f"Answer Generator initialized: {self.model_name}")
     
@@ -42,24 +83,30 @@ class AnswerGenerator:
         Returns:
             Formatted prompt
         """
-        prompt = f"""You are a helpful AI assistant that answers questions based on provided document context.
-
-INSTRUCTIONS:
-1. Answer the question using ONLY the information from the provided context
-2. If the answer is not in the context, say "I cannot answer this question based on the provided documents"
-3. Include specific page citations in your answer using the format [Source X, Page Y]
-4. Be detailed and comprehensive in your answer
-5. Quote relevant parts of the context when appropriate
-6. Do not make up information or use external knowledge
-
-CONTEXT:
-{context}
-
-QUESTION: {question}
-
-ANSWER:"""
-        
-        return prompt
+        return _PROMPT_TEMPLATE.format(context=context, question=question)
+    
+    def _cache_key(self, question: str, context: str) -> str:
+        """Key an answer by the generation settings and the exact prompt inputs."""
+        key = f"{self.model_name}|{self.temperature}|{self.top_p}|{self.top_k}|{question}|{context}"
+        return hashlib.blake2b(key.encode('utf-8'), digest_size=16).hexdigest()
+    
+    def _get_cached_answer(self, key: str) -> Optional[str]:
+        """Look up a previously generated answer."""
+        try:
+            with closing(sqlite3.connect(self.cache_path)) as conn:
+                row = conn.execute("SELECT answer FROM answers WHERE key = ?", (key,)).fetchone()
+            return row[0] if row else None
+        except sqlite3.Error as e:
+            logger.warning(f"Could not read answer cache: {e}")
+            return None
+    
+    def _store_cached_answer(self, key: str, answer_text: str) -> None:
+        """Save a generated answer."""
+        try:
+            with closing(sqlite3.connect(self.cache_path)) as conn, conn:
+                conn.execute("INSERT OR REPLACE INTO answers (key, answer) VALUES (?, ?)", (key, answer_text))
+        except sqlite3.Error as e:
+            logger.warning(f"Could not write answer cache: {e}")
     
     def extract_citations(self, retrieved_chunks: List[Dict]) -> List[Dict]:
         """
@@ -103,22 +150,22 @@ ANSWER:"""
         """
         logger.info(f"Generating answer for question: {question[:100]}...")
         
-        # Create prompt
-        prompt = self.create_prompt(question, context)
+        cache_key = self._cache_key(question, context) if self.cache_enabled else None
+        answer_text = self._get_cached_answer(cache_key) if cache_key else None
         
         try:
-            # Generate answer
-            response = self.model.generate_content(
-                prompt,
-                generation_config=genai.types.GenerationConfig(
-                    temperature=self.temperature,
-                    max_output_tokens=self.max_tokens,
-                    top_p=self.top_p,
-                    top_k=self.top_k
-                )
-            )
-            
-            answer_text = response.text
+            if answer_text is not None:
+                logger.info("Using cached answer")
+            else:
+                # Create prompt
+                prompt = self.create_prompt(question, context)
+                
+                # Generate answer
+                response = self.model.generate_content(prompt)
+                
+                answer_text = response.text
+                if cache_key:
+                    self._store_cached_answer(cache_key, answer_text)
             
             # Extract citations if chunks provided
             citations = []
@@ -163,9 +210,7 @@ ANSWER:"""
             Answer dictionary
         """
         # Format context from chunks
-        from src.qa_pipeline.retriever import HybridRetriever
-        retriever = HybridRetriever()
-        context = retriever.format_context(retrieved_chunks)
+        context = HybridRetriever.format_context(retrieved_chunks)
         
         # Generate answer
         return self.generate_answer(question, context, retrieved_chunks)
@@ -1,7 +1,14 @@
 """Query expansion using Gemini LLM."""
-from typing import List
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import List, Optional
 import google.generativeai as genai
-from src.utils import setup_logger, get_model_config, get_api_key, load_env, get_settings
+from src.utils import (
+    setup_logger, get_model_config, get_api_key, load_env, get_settings, get_paths,
+    ensure_dir, save_json, load_json, file_exists
+)
 
 logger = setup_logger(__name__)
 
@@ -31,11 +38,66 @@ class QueryExpander:
         self.min_variations = self.expansion_settings.get('min_variations', 3)
         self.max_variations = self.expansion_settings.get('max_variations', 7)
         
-        # Initialize model
-        self.model = genai.GenerativeModel(self.model_name)
+        # Generated variations cached in memory (LRU) and on disk, one JSON file per key
+        self.cache_enabled = self.expansion_settings.get('cache_enabled', True)
+        self.cache_max_entries = self.expansion_settings.get('cache_max_entries', 4096)
+        self.cache_dir = os.path.join(get_paths()['cache_dir'], 'query_expansion')
+        self._memory_cache: OrderedDict = OrderedDict()
+        # The expander can serve several sessions at once; guards _memory_cache
+        self._memory_cache_lock = threading.Lock()
+        if self.cache_enabled:
+            ensure_dir(self.cache_dir)
+        
+        # Initialize model with its fixed generation settings
+        self.generation_config = genai.types.GenerationConfig(
+            temperature=self.temperature,
+            max_output_tokens=self.max_tokens
+        )
+        self.model = genai.GenerativeModel(self.model_name, generation_config=self.generation_config)
         
         logger.info(f"Query Expander initialized: {self.model_name}")
     
+    def _cache_key(self, query: str, num_variations: int) -> str:
+        """Key generated variations by model settings and the normalized query."""
+        key = f"{self.model_name}|{self.temperature}|{num_variations}|{query.strip().lower()}"
+        return hashlib.blake2b(key.encode('utf-8'), digest_size=16).hexdigest()
+    
+    def _get_cached_variations(self, key: str) -> Optional[List[str]]:
+        """Look up generated variations in memory, then on disk."""
+        with self._memory_cache_lock:
+            variations = self._memory_cache.get(key)
+            if variations is not None:
+                self._memory_cache.move_to_end(key)
+                return variations
+        
+        cache_path = os.path.join(self.cache_dir, f"{key}.json")
+        if file_exists(cache_path):
+            try:
+                variations = load_json(cache_path)
+            except Exception as e:
+                logger.warning(f"Could not read query expansion cache {cache_path}: {e}")
+                return None
+            self._remember_variations(key, variations)
+            return variations
+        
+        return None
+    
+    def _remember_variations(self, key: str, variations: List[str]) -> None:
+        """Add variations to the in-memory LRU, evicting the least recently used."""
+        with self._memory_cache_lock:
+            self._memory_cache[key] = variations
+            self._memory_cache.move_to_end(key)
+            while len(self._memory_cache) > self.cache_max_entries:
+                self._memory_cache.popitem(last=False)
+    
+    def _store_cached_variations(self, key: str, variations: List[str]) -> None:
+        """Write generated variations through to memory and disk."""
+        self._remember_variations(key, variations)
+        try:
+            save_json(variations, os.path.join(self.cache_dir, f"{key}.json"))
+        except Exception as e:
+            logger.warning(f"Could not write query expansion cache: {e}")
+    
     def expand_query(self, query: str, num_variations: int = None) -> List[str]:
         """
         Expand a query into multiple variations.
@@ -55,6 +117,14 @@ class QueryExpander:
         
         num_variations = max(self.min_variations, min(num_variations, self.max_variations))
         
+        cache_key = None
+        if self.cache_enabled:
+            cache_key = self._cache_key(query, num_variations)
+            cached = self._get_cached_variations(cache_key)
+            if cached is not None:
+                logger.info(f"Using cached expansion with {len(cached) + 1} variations")
+                return [query] + cached
+        
         prompt = f"""Generate {num_variations - 1} alternative phrasings of the following question. 
 The alternatives should:
 - Preserve the original meaning
@@ -67,19 +137,17 @@ Original question: {query}
 Provide only the alternative questions, one per line, without numbering or explanations."""
         
         try:
-            response = self.model.generate_content(
-                prompt,
-                generation_config=genai.types.GenerationConfig(
-                    temperature=self.temperature,
-                    max_output_tokens=self.max_tokens
-                )
-            )
+            response = self.model.generate_content(prompt)
             
             # Parse variations
             variations = [line.strip() for line in response.text.strip().split('\n') if line.strip()]
             
+            variations = variations[:num_variations - 1]
+            if cache_key:
+                self._store_cached_variations(cache_key, variations)
+            
             # Add original query at the beginning
-            all_variations = [query] + variations[:num_variations - 1]
+            all_variations = [query] + variations
             
             logger.info(f"Expanded query into {len(all_variations)} variations")
             return all_variations
@@ -1,11 +1,22 @@
 """Hybrid retrieval combining semantic and keyword search."""
-from typing import List, Dict, Set
+import hashlib
+import heapq
+from typing import List, Dict, Iterable, Iterator, Set
 from src.utils import setup_logger, get_settings
 from src.vector_store import ChromaManager
 from src.qa_pipeline.query_expander import QueryExpander
 
 logger = setup_logger(__name__)
 
+# Characters of each result hashed for deduplication
+_FINGERPRINT_CHARS = 512
+
+
+def _fingerprint(text: str) -> bytes:
+    """64-bit digest of the whitespace-normalized start of a text."""
+    normalized = ' '.join(text[:_FINGERPRINT_CHARS].split())
+    return hashlib.blake2b(normalized.encode('utf-8'), digest_size=8).digest()
+
 
 class HybridRetriever:
     """Retrieve relevant chunks using hybrid search with query expansion."""
@@ -42,16 +53,15 @@ class HybridRetriever:
         Returns:
             Deduplicated results
         """
-        seen_texts: Set[str] = set()
+        seen_texts: Set[bytes] = set()
+        seen_add = seen_texts.add
         unique_results = []
         
         for result in results:
-            text = result['text']
-            # Use first 100 characters as fingerprint
-            fingerprint = text[:100]
+            fingerprint = _fingerprint(result['text'])
             
             if fingerprint not in seen_texts:
-                seen_texts.add(fingerprint)
+                seen_add(fingerprint)
                 unique_results.append(result)
         
         if len(unique_results) < len(results):
@@ -76,6 +86,26 @@ class HybridRetriever:
         
         return filtered
     
+    def _unique_above_threshold(self, results: Iterable[Dict]) -> Iterator[Dict]:
+        """
+        Yield results that are first occurrences and meet the similarity threshold.
+        
+        Same outcome as deduplicate_results followed by filter_by_threshold: a
+        duplicate is skipped even when its first occurrence was filtered out.
+        """
+        seen_texts: Set[bytes] = set()
+        seen_add = seen_texts.add
+        threshold = self.similarity_threshold
+        
+        for result in results:
+            fingerprint = _fingerprint(result['text'])
+            if fingerprint in seen_texts:
+                continue
+            seen_add(fingerprint)
+            
+            if result.get('similarity', 0) >= threshold:
+                yield result
+    
     def retrieve_with_expansion(self, query: str, top_k: int = None) -> List[Dict]:
         """
         Retrieve chunks using query expansion and hybrid search.
@@ -93,33 +123,25 @@ class HybridRetriever:
         query_variations = self.query_expander.expand_query(query)
         logger.info(f"Using {len(query_variations)} query variations")
         
-        # Retrieve for each variation
-        all_results = []
-        for variation in query_variations:
-            if self.use_hybrid:
-                results = self.chroma_manager.hybrid_search(
-                    variation,
-                    n_results=k,
-                    semantic_weight=self.semantic_weight,
-                    keyword_weight=self.keyword_weight
-                )
-            else:
-                results = self.chroma_manager.search(variation, n_results=k)
-            
-            all_results.extend(results)
-        
-        # Deduplicate
-        unique_results = self.deduplicate_results(all_results)
+        # Retrieve for all variations at once
+        if self.use_hybrid:
+            result_batches = self.chroma_manager.hybrid_search_batch(
+                query_variations,
+                n_results=k,
+                semantic_weight=self.semantic_weight,
+                keyword_weight=self.keyword_weight
+            )
+        else:
+            result_batches = self.chroma_manager.search_batch(query_variations, n_results=k)
         
-        # Filter by threshold
-        filtered_results = self.filter_by_threshold(unique_results)
+        all_results = (result for results in result_batches for result in results)
         
-        # Sort by similarity and take top k
-        sorted_results = sorted(
-            filtered_results,
-            key=lambda x: x.get('similarity', 0),
-            reverse=True
-        )[:k]
+        # Deduplicate, filter by threshold and take the top k in a single pass
+        sorted_results = heapq.nlargest(
+            k,
+            self._unique_above_threshold(all_results),
+            key=lambda x: x.get('similarity', 0)
+        )
         
         logger.info(f"Retrieved {len(sorted_results)} unique chunks")
         return sorted_results
@@ -137,7 +159,8 @@ class HybridRetriever:
         """
         return self.retrieve_with_expansion(query, top_k)
     
-    def format_context(self, results: List[Dict]) -> str:
+    @staticmethod
+    def format_context(results: List[Dict]) -> str:
         """
         Format retrieved chunks into context string.
         
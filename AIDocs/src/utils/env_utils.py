@@ -1,67 +1,141 @@
 """Environment and configuration utilities."""
+import hashlib
 import os
-from pathlib import Path
-from typing import Dict, Any
+from functools import lru_cache
+from typing import Dict, Any, Tuple
 import json
 import yaml
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:  # PyYAML built without libyaml
+    from yaml import SafeLoader as _YamlLoader
 from dotenv import load_dotenv
+from .file_utils import save_json, load_json
 
 
+@lru_cache(maxsize=None)
 def load_env() -> None:
-    """Load environment variables from .env file."""
+    """Load environment variables from .env file (once per process)."""
     load_dotenv()
 
 
+@lru_cache(maxsize=None)
 def get_api_key(key_name: str = "GOOGLE_API_KEY") -> str:
     """
     Get API key from environment variables.
     
     Args:
         key_name: Name of the environment variable
-        
+    
     Returns:
         API key value
-        
+    
     Raises:
         ValueError: If API key is not found
     """
-    api_key = os.getenv(key_name)
+    api_key = os.environ.get(key_name)
     if not api_key:
         raise ValueError(f"{key_name} not found in environment variables. Please set it in .env file.")
     return api_key
 
 
+# Config file for each config type
+_CONFIG_FILES = {
+    "paths": "config/paths_config.json",
+    "model": "config/model_config.json",
+    "settings": "config/settings.yaml"
+}
+
+# Parsed configs keyed by (config path, modification time in ns)
+_CONFIG_CACHE: Dict[Tuple[str, int], Any] = {}
+
+# Set to 1 to keep a JSON copy of each parsed YAML config, keyed by its content
+_SIDECAR_ENV_VAR = "AIDOCS_CONFIG_CACHE"
+_SIDECAR_DIR_NAME = ".cache"
+
+
+def _load_yaml_config(config_path: str) -> Dict[str, Any]:
+    """
+    Parse a YAML config, going through its JSON sidecar when enabled.
+    
+    Sidecars live in `.cache/` next to the config and are named after a hash
+    of the YAML content, so they stay valid across checkouts and image builds
+    that reset modification times.
+    
+    Args:
+        config_path: Path to the YAML file
+    
+    Returns:
+        Configuration dictionary
+    """
+    with open(config_path, 'rb') as f:
+        raw = f.read()
+    
+    if os.environ.get(_SIDECAR_ENV_VAR) != "1":
+        return yaml.load(raw, Loader=_YamlLoader)
+    
+    sidecar_dir = os.path.join(os.path.dirname(config_path), _SIDECAR_DIR_NAME)
+    basename = os.path.basename(config_path)
+    digest = hashlib.blake2b(raw, digest_size=8).hexdigest()
+    sidecar_path = os.path.join(sidecar_dir, f"{basename}.{digest}.json")
+    
+    try:
+        return load_json(sidecar_path)
+    except (OSError, ValueError):
+        pass
+    
+    config = yaml.load(raw, Loader=_YamlLoader)
+    
+    try:
+        save_json(config, sidecar_path)
+        # Drop sidecars of earlier versions of this config
+        for name in os.listdir(sidecar_dir):
+            if name.startswith(basename + '.') and name != os.path.basename(sidecar_path):
+                os.remove(os.path.join(sidecar_dir, name))
+    except (OSError, TypeError):
+        pass
+    return config
+
+
 def load_config(config_type: str = "paths") -> Dict[str, Any]:
     """
     Load configuration from config files.
     
+    A file is parsed again only when its modification time changes; callers
+    share the returned dictionary and must treat it as read-only.
+    
     Args:
         config_type: Type of config to load ('paths', 'model', 'settings')
-        
+    
     Returns:
         Configuration dictionary
     """
-    config_files = {
-        "paths": "config/paths_config.json",
-        "model": "config/model_config.json",
-        "settings": "config/settings.yaml"
-    }
-    
-    config_path = config_files.get(config_type)
+    config_path = _CONFIG_FILES.get(config_type)
     if not config_path:
         raise ValueError(f"Unknown config type: {config_type}")
     
-    if not Path(config_path).exists():
+    try:
+        mtime = os.stat(config_path).st_mtime_ns
+    except FileNotFoundError:
         raise FileNotFoundError(f"Configuration file not found: {config_path}")
     
+    cache_key = (config_path, mtime)
+    if cache_key in _CONFIG_CACHE:
+        return _CONFIG_CACHE[cache_key]
+    
     if config_path.endswith('.json'):
         with open(config_path, 'r') as f:
-            return json.load(f)
+            config = json.load(f)
     elif config_path.endswith('.yaml') or config_path.endswith('.yml'):
-        with open(config_path, 'r') as f:
-            return yaml.safe_load(f)
+        config = _load_yaml_config(config_path)
     else:
         raise ValueError(f"Unsupported config file format: {config_path}")
+    
+    # Forget earlier versions of the same file
+    for stale_key in [key for key in _CONFIG_CACHE if key[0] == config_path]:
+        del _CONFIG_CACHE[stale_key]
+    _CONFIG_CACHE[cache_key] = config
+    return config
 
 
 def get_paths() -> Dict[str, str]:
@@ -1,9 +1,23 @@
 """File utility functions for the RAG system."""
-import json
+import mmap
 import os
 from pathlib import Path
 from typing import Any, Dict, List
 import shutil
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib encoder
+    orjson = None
+    import json
+
+# Indented output; numpy values and non-string keys are serialized natively
+_ORJSON_OPTIONS = (
+    orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+    if orjson is not None else 0
+)
+
+# Files at least this large are parsed from a memory map instead of a bytes copy
+_MMAP_MIN_BYTES = 1 << 20
 
 
 def ensure_dir(directory: str) -> None:
@@ -14,14 +28,33 @@ def ensure_dir(directory: str) -> None:
 def save_json(data: Any, filepath: str) -> None:
     """Save data to JSON file."""
     ensure_dir(os.path.dirname(filepath))
-    with open(filepath, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    if orjson is None:
+        with open(filepath, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False, default=_json_default)
+        return
+    
+    Path(filepath).write_bytes(orjson.dumps(data, option=_ORJSON_OPTIONS))
 
 
 def load_json(filepath: str) -> Any:
     """Load data from JSON file."""
-    with open(filepath, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    with open(filepath, 'rb') as f:
+        if orjson is None:
+            return json.load(f)
+        
+        if os.fstat(f.fileno()).st_size < _MMAP_MIN_BYTES:
+            return orjson.loads(f.read())
+        
+        # Parse straight from the page cache rather than reading into a bytes object
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped, memoryview(mapped) as view:
+            return orjson.loads(view)
+
+
+def _json_default(obj: Any) -> Any:
+    """Convert numpy scalars and arrays for the stdlib encoder."""
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
 
 
 def save_text(text: str, filepath: str) -> None:
@@ -44,17 +77,19 @@ def list_files(directory: str, extension: str = None) -> List[str]:
     Args:
         directory: Directory path
         extension: File extension filter (e.g., '.pdf')
-        
+    
     Returns:
         List of file paths
     """
-    path = Path(directory)
-    if not path.exists():
+    try:
+        # DirEntry.is_file() reuses the file type from the directory listing
+        with os.scandir(directory) as entries:
+            return [
+                entry.path for entry in entries
+                if (not extension or entry.name.endswith(extension)) and entry.is_file()
+            ]
+    except FileNotFoundError:
         return []
-    
-    if extension:
-        return [str(f) for f in path.glob(f'*{extension}')]
-    return [str(f) for f in path.iterdir() if f.is_file()]
 
 
 def clear_directory(directory: str) -> None:
@@ -1,25 +1,40 @@
 """Logging utility for the RAG system."""
 import logging
 import os
+from functools import lru_cache
+from logging.handlers import RotatingFileHandler
 from pathlib import Path
+from typing import Dict
 import yaml
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:  # PyYAML built without libyaml
+    from yaml import SafeLoader as _YamlLoader
 
+# One rotating handler per log file, shared by every logger writing to it:
+# separate handlers on the same file would rotate it out from under each other
+_FILE_HANDLERS: Dict[str, RotatingFileHandler] = {}
 
+
+@lru_cache(maxsize=None)
 def setup_logger(name: str, config_path: str = "config/settings.yaml") -> logging.Logger:
     """
     Set up a logger with configuration from settings.yaml.
     
+    Each logger is configured once per process; later calls with the same
+    arguments return it without re-reading the config or rebuilding handlers.
+    
     Args:
         name: Logger name
         config_path: Path to settings configuration file
-        
+    
     Returns:
         Configured logger instance
     """
     # Load logging configuration
     try:
         with open(config_path, 'r') as f:
-            config = yaml.safe_load(f)
+            config = yaml.load(f, Loader=_YamlLoader)
             log_config = config.get('logging', {})
     except FileNotFoundError:
         log_config = {
@@ -46,11 +61,20 @@ def setup_logger(name: str, config_path: str = "config/settings.yaml") -> loggin
     console_handler.setFormatter(console_formatter)
     logger.addHandler(console_handler)
     
-    # File handler
-    file_handler = logging.FileHandler(log_file)
-    file_handler.setLevel(logging.DEBUG)
-    file_formatter = logging.Formatter(log_config.get('format'))
-    file_handler.setFormatter(file_formatter)
+    # File handler, opened on the first record and rotated by size
+    file_handler = _FILE_HANDLERS.get(log_file)
+    if file_handler is None:
+        file_handler = RotatingFileHandler(
+            log_file,
+            maxBytes=log_config.get('max_bytes', 10_000_000),
+            backupCount=log_config.get('backup_count', 3),
+            encoding='utf-8',
+            delay=True
+        )
+        file_handler.setLevel(logging.DEBUG)
+        file_formatter = logging.Formatter(log_config.get('format'))
+        file_handler.setFormatter(file_formatter)
+        _FILE_HANDLERS[log_file] = file_handler
     logger.addHandler(file_handler)
     
     return logger
@@ -1,4 +1,5 @@
 """Vector store module."""
 from .chroma_manager import ChromaManager
+from .faiss_manager import FaissManager
 
-__all__ = ['ChromaManager']
+__all__ = ['ChromaManager', 'FaissManager']
@@ -1,15 +1,42 @@
 """ChromaDB vector store manager."""
-from typing import List, Dict, Optional, Tuple
+import heapq
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from operator import itemgetter
+from typing import List, Dict, Optional, Sequence, Tuple, Union
 import chromadb
 from chromadb.config import Settings
 from chromadb.utils import embedding_functions
-import uuid
-from src.utils import setup_logger, get_paths, get_settings, ensure_dir
+import os
+import numpy as np
+from src.utils import setup_logger, get_paths, get_settings, ensure_dir, save_json, load_json, file_exists
 from src.embeddings import EmbeddingGenerator
+from .keywords import keyword_terms, tokenize
+from .rank_fusion import fuse_rankings
 
 logger = setup_logger(__name__)
 
 
+def _random_ids(count: int) -> List[str]:
+    """Generate unique 32-character hex ids from a single os.urandom call."""
+    raw = os.urandom(16 * count).hex()
+    return [raw[i:i + 32] for i in range(0, 32 * count, 32)]
+
+
+def _chunk_metadata(chunk_id: int, word_count: int, metadata: Optional[Dict]) -> Dict:
+    """Flatten a chunk's metadata to the simple types ChromaDB accepts."""
+    metadata = metadata or {}
+    return {
+        'chunk_id': chunk_id,
+        'page_number': metadata.get('page_number', 0),
+        'document_title': metadata.get('document_title', ''),
+        'filename': metadata.get('filename', ''),
+        'word_count': word_count
+    }
+
+
 class ChromaManager:
     """Manage ChromaDB vector store for document chunks."""
     
@@ -43,18 +70,88 @@ class ChromaManager:
             metadata={"description": "PDF document chunks with embeddings"}
         )
         
-        # Initialize embedding generator
-        self.embedding_generator = EmbeddingGenerator()
+        vector_store_config = self.settings_config.get('vector_store', {})
+        
+        # Threads submitting add() batches concurrently during ingest
+        self.ingest_workers = vector_store_config.get('ingest_workers', 4)
+        
+        # Keyword leg of hybrid search scores at most n_results * factor matching chunks; 0 = all
+        self.keyword_candidate_factor = vector_store_config.get('keyword_candidate_factor', 10)
+        
+        # Semantic search results cached (LRU) until the collection changes; 0 disables
+        self.search_cache_size = vector_store_config.get('search_cache_size', 256)
+        self._search_cache: OrderedDict = OrderedDict()
+        # Shared pipelines search from several sessions at once; guards _search_cache
+        self._search_cache_lock = threading.Lock()
+        
+        # Embedding generator is created on first use; stats and deletes never need it
+        self._embedding_generator: Optional[EmbeddingGenerator] = None
+        
+        # filename -> chunk ids, so most chunks are deleted by id; written to disk by flush()
+        self.filename_index_path = os.path.join(persist_dir, f"{collection_name}_filename_index.json")
+        self._filename_ids: Dict[str, List[str]] = self._load_filename_index()
+        self._filename_index_dirty = False
         
         logger.info(f"ChromaDB initialized: collection='{collection_name}', persist_dir='{persist_dir}'")
     
-    def add_chunks(self, chunks: List[Dict], batch_size: int = 100) -> None:
+    def _load_filename_index(self) -> Dict[str, List[str]]:
+        """Load the filename -> ids index, rebuilding it from the collection if missing."""
+        if file_exists(self.filename_index_path):
+            try:
+                return load_json(self.filename_index_path)
+            except Exception as e:
+                logger.warning(f"Could not read filename index {self.filename_index_path}: {e}")
+        
+        filename_ids: Dict[str, List[str]] = {}
+        if self.collection.count():
+            existing = self.collection.get(include=['metadatas'])
+            for doc_id, metadata in zip(existing['ids'], existing['metadatas']):
+                filename_ids.setdefault((metadata or {}).get('filename', ''), []).append(doc_id)
+            logger.info(f"Rebuilt filename index for {len(filename_ids)} files")
+        
+        self._filename_ids = filename_ids
+        self._save_filename_index()
+        return filename_ids
+    
+    def _save_filename_index(self) -> None:
+        """Write the filename -> ids index next to the collection."""
+        try:
+            save_json(self._filename_ids, self.filename_index_path)
+            self._filename_index_dirty = False
+        except Exception as e:
+            logger.warning(f"Could not write filename index: {e}")
+    
+    def flush(self) -> None:
+        """
+        Write the filename index if chunks were added since it was last saved.
+        
+        Adds only update the index in memory, so an ingest that adds many
+        windows should call this once at the end.
+        """
+        if self._filename_index_dirty:
+            self._save_filename_index()
+    
+    @property
+    def embedding_generator(self) -> EmbeddingGenerator:
+        """Embedding generator for chunks and queries, created on first access."""
+        if self._embedding_generator is None:
+            self._embedding_generator = EmbeddingGenerator()
+        return self._embedding_generator
+    
+    def add_chunks(
+        self,
+        chunks: List[Dict],
+        batch_size: int = 100,
+        embeddings: Optional[np.ndarray] = None
+    ) -> None:
         """
         Add chunks to the vector store.
         
         Args:
             chunks: List of chunk dictionaries with text, metadata, and optionally embeddings
             batch_size: Batch size for adding to ChromaDB
+            embeddings: Optional [len(chunks), dim] array; row i is the embedding of chunks[i].
+                Takes precedence over any 'embedding' field on the chunks.
         """
         if not chunks:
             logger.warning("No chunks to add")
@@ -62,53 +159,153 @@ class ChromaManager:
         
         logger.info(f"Adding {len(chunks)} chunks to ChromaDB")
         
-        # Check if chunks have embeddings
-        if 'embedding' not in chunks[0]:
-            logger.info("Chunks don't have embeddings, generating them...")
-            chunks = self.embedding_generator.embed_chunks(chunks)
+        if embeddings is None:
+            if 'embedding' in chunks[0]:
+                embeddings = [chunk['embedding'] for chunk in chunks]
+            else:
+                logger.info("Chunks don't have embeddings, generating them...")
+                chunks, embeddings = self.embedding_generator.embed_chunks_array(chunks)
         
-        # Prepare data for ChromaDB
-        ids = []
-        documents = []
-        embeddings = []
-        metadatas = []
-        
-        for chunk in chunks:
-            # Generate unique ID
-            chunk_id = str(uuid.uuid4())
-            ids.append(chunk_id)
-            
-            # Extract text
-            documents.append(chunk['text'])
-            
-            # Extract embedding
-            embeddings.append(chunk['embedding'])
+        # Transpose the chunk dicts into columns
+        self.add_chunks_soa(
+            [chunk['text'] for chunk in chunks],
+            embeddings,
+            [chunk.get('metadata') for chunk in chunks],
+            chunk_ids=[chunk.get('chunk_id', 0) for chunk in chunks],
+            word_counts=[chunk.get('word_count', 0) for chunk in chunks],
+            batch_size=batch_size
+        )
+    
+    def add_chunks_soa(
+        self,
+        texts: List[str],
+        embeddings: Union[np.ndarray, List[List[float]]],
+        metadatas: Optional[List[Optional[Dict]]] = None,
+        chunk_ids: Optional[Sequence[int]] = None,
+        word_counts: Optional[Sequence[int]] = None,
+        batch_size: int = 100
+    ) -> None:
+        """
+        Add chunks given as parallel columns rather than chunk dictionaries.
+        
+        Args:
+            texts: Chunk texts
+            embeddings: [len(texts), dim] array (or list of vectors); row i embeds texts[i]
+            metadatas: Per-chunk source metadata (page_number, document_title, filename)
+            chunk_ids: Per-chunk ids within their document (default: positions)
+            word_counts: Per-chunk word counts (default: counted from texts)
+            batch_size: Batch size for adding to ChromaDB
+        """
+        count = len(texts)
+        if len(embeddings) != count:
+            raise ValueError(f"Got {len(embeddings)} embeddings for {count} chunks")
+        if not count:
+            return
+        
+        if metadatas is None:
+            metadatas = [None] * count
+        if chunk_ids is None:
+            chunk_ids = range(count)
+        if word_counts is None:
+            word_counts = [len(text.split()) for text in texts]
+        
+        # New chunks can change any search result
+        self._clear_search_cache()
+        
+        # Prepare data for ChromaDB, one column at a time
+        ids = _random_ids(count)
+        metadatas = list(map(_chunk_metadata, chunk_ids, word_counts, metadatas))
+        
+        # Index the ids before adding, so batches written before a failure are still found
+        for doc_id, metadata in zip(ids, metadatas):
+            self._filename_ids.setdefault(metadata['filename'], []).append(doc_id)
+        self._filename_index_dirty = True
+        
+        def add_batch(i: int) -> None:
+            batch_end = min(i + batch_size, count)
             
-            # Prepare metadata (ChromaDB requires simple types)
-            metadata = chunk.get('metadata', {})
-            clean_metadata = {
-                'chunk_id': chunk.get('chunk_id', 0),
-                'page_number': metadata.get('page_number', 0),
-                'document_title': metadata.get('document_title', ''),
-                'filename': metadata.get('filename', ''),
-                'word_count': chunk.get('word_count', 0)
-            }
-            metadatas.append(clean_metadata)
-        
-        # Add to ChromaDB in batches
-        for i in range(0, len(chunks), batch_size):
-            batch_end = min(i + batch_size, len(chunks))
+            batch_embeddings = embeddings[i:batch_end]
+            if isinstance(batch_embeddings, np.ndarray):
+                batch_embeddings = batch_embeddings.tolist()
             
             self.collection.add(
                 ids=ids[i:batch_end],
-                documents=documents[i:batch_end],
-                embeddings=embeddings[i:batch_end],
+                documents=texts[i:batch_end],
+                embeddings=batch_embeddings,
                 metadatas=metadatas[i:batch_end]
             )
             
             logger.debug(f"Added batch {i//batch_size + 1}: {batch_end - i} chunks")
         
-        logger.info(f"Successfully added {len(chunks)} chunks to ChromaDB")
+        # Add to ChromaDB in batches, several in flight when configured
+        batch_starts = range(0, count, batch_size)
+        workers = min(self.ingest_workers, len(batch_starts))
+        if workers > 1:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                list(executor.map(add_batch, batch_starts))
+        else:
+            for i in batch_starts:
+                add_batch(i)
+        
+        logger.info(f"Successfully added {count} chunks to ChromaDB")
+    
+    def _format_results(self, results: Dict, query_index: int = 0) -> List[Dict]:
+        """Convert one query's rows of a collection.query() response into result dicts."""
+        if not (results['ids'] and results['ids'][query_index]):
+            return []
+        
+        ids = results['ids'][query_index]
+        documents = results['documents'][query_index]
+        metadatas = results['metadatas'][query_index]
+        if not results.get('distances'):
+            return [
+                {'id': doc_id, 'text': text, 'metadata': metadata, 'distance': None, 'similarity': None}
+                for doc_id, text, metadata in zip(ids, documents, metadatas)
+            ]
+        
+        return [
+            {'id': doc_id, 'text': text, 'metadata': metadata, 'distance': distance, 'similarity': 1 - distance}
+            for doc_id, text, metadata, distance in zip(ids, documents, metadatas, results['distances'][query_index])
+        ]
+    
+    @staticmethod
+    def _search_cache_key(
+        query: str,
+        n_results: int,
+        where: Optional[Dict],
+        where_document: Optional[Dict]
+    ) -> Tuple[str, int, str, str]:
+        """Key a semantic search by its query and canonicalized filters."""
+        return (
+            query,
+            n_results,
+            json.dumps(where, sort_keys=True) if where else '',
+            json.dumps(where_document, sort_keys=True) if where_document else ''
+        )
+    
+    def _get_cached_search(self, key: Tuple) -> Optional[List[Dict]]:
+        """Return a copy of cached search results, marking them recently used."""
+        with self._search_cache_lock:
+            results = self._search_cache.get(key)
+            if results is None:
+                return None
+            self._search_cache.move_to_end(key)
+            return list(results)
+    
+    def _store_cached_search(self, key: Tuple, results: List[Dict]) -> None:
+        """Cache search results, evicting the least recently used past the size limit."""
+        if self.search_cache_size <= 0:
+            return
+        with self._search_cache_lock:
+            self._search_cache[key] = list(results)
+            self._search_cache.move_to_end(key)
+            while len(self._search_cache) > self.search_cache_size:
+                self._search_cache.popitem(last=False)
+    
+    def _clear_search_cache(self) -> None:
+        """Drop all cached search results."""
+        with self._search_cache_lock:
+            self._search_cache.clear()
     
     def search(
         self, 
@@ -125,10 +322,16 @@ class ChromaManager:
             n_results: Number of results to return
             where: Metadata filter
             where_document: Document content filter
-            
+        
         Returns:
             List of result dictionaries with text, metadata, and distance
         """
+        cache_key = self._search_cache_key(query, n_results, where, where_document)
+        cached = self._get_cached_search(cache_key)
+        if cached is not None:
+            logger.info(f"Using cached search with {len(cached)} results")
+            return cached
+        
         # Generate query embedding
         query_embedding = self.embedding_generator.embed_query(query)
         
@@ -141,20 +344,114 @@ class ChromaManager:
         )
         
         # Format results
-        formatted_results = []
-        if results['ids'] and results['ids'][0]:
-            for i in range(len(results['ids'][0])):
-                formatted_results.append({
-                    'id': results['ids'][0][i],
-                    'text': results['documents'][0][i],
-                    'metadata': results['metadatas'][0][i],
-                    'distance': results['distances'][0][i] if 'distances' in results else None,
-                    'similarity': 1 - results['distances'][0][i] if 'distances' in results else None
-                })
+        formatted_results = self._format_results(results)
+        # A zero vector is the embedder's failure fallback; don't cache its results
+        if any(query_embedding):
+            self._store_cached_search(cache_key, formatted_results)
         
         logger.info(f"Found {len(formatted_results)} results for query")
         return formatted_results
     
+    def search_batch(
+        self,
+        queries: List[str],
+        n_results: int = 8,
+        where: Optional[Dict] = None,
+        where_document: Optional[Dict] = None
+    ) -> List[List[Dict]]:
+        """
+        Semantic search for several queries with one embedding request and one query.
+        
+        Args:
+            queries: Search queries
+            n_results: Number of results to return per query
+            where: Metadata filter
+            where_document: Document content filter
+        
+        Returns:
+            One list of result dictionaries per query, in input order
+        """
+        if not queries:
+            return []
+        
+        # Only queries without cached results are embedded and searched
+        keys = [self._search_cache_key(query, n_results, where, where_document) for query in queries]
+        results_by_key = {}
+        pending = {}
+        for key, query in zip(keys, queries):
+            if key in results_by_key or key in pending:
+                continue
+            cached = self._get_cached_search(key)
+            if cached is not None:
+                results_by_key[key] = cached
+            else:
+                pending[key] = query
+        
+        if pending:
+            query_embeddings = self.embedding_generator.embed_queries(list(pending.values()))
+            
+            results = self.collection.query(
+                query_embeddings=query_embeddings,
+                n_results=n_results,
+                where=where,
+                where_document=where_document
+            )
+            
+            for q, key in enumerate(pending):
+                results_by_key[key] = self._format_results(results, q)
+                # Zero vectors mark failed embeddings; leave those uncached
+                if any(query_embeddings[q]):
+                    self._store_cached_search(key, results_by_key[key])
+        
+        formatted_results = [list(results_by_key[key]) for key in keys]
+        
+        logger.info(f"Found {sum(map(len, formatted_results))} results for {len(queries)} queries")
+        return formatted_results
+    
+    def _keyword_search(self, query: str, n_results: int) -> List[Dict]:
+        """
+        Rank chunks containing the query's most distinctive terms.
+        
+        The query's keyword terms are matched with where_document $contains (in
+        lower and capitalized form, since matching is case-sensitive) and the
+        candidates are ranked by how many of the terms they contain as whole
+        words, the same scoring FaissManager uses.
+        
+        With keyword_candidate_factor set, only the first n_results * factor
+        matching chunks are scored. Chroma returns them in storage order, so
+        on large collections older documents are favoured; set the factor to 0
+        to score every match.
+        
+        Args:
+            query: Search query
+            n_results: Number of results to return
+        
+        Returns:
+            Result dictionaries with id, text and metadata, best match first
+        """
+        terms = keyword_terms(query)
+        if not terms:
+            return []
+        
+        conditions = [{'$contains': term} for term in terms]
+        conditions += [{'$contains': term.capitalize()} for term in terms if term.capitalize() != term]
+        where_document = conditions[0] if len(conditions) == 1 else {'$or': conditions}
+        
+        candidates = self.collection.get(
+            where_document=where_document,
+            limit=n_results * self.keyword_candidate_factor or None,
+            include=['documents', 'metadatas']
+        )
+        
+        # Score by number of distinct terms present as words; ties keep Chroma's order
+        scored = []
+        for doc_id, text, metadata in zip(candidates['ids'], candidates['documents'], candidates['metadatas']):
+            hits = len(tokenize(text).intersection(terms))
+            if hits:
+                scored.append((hits, {'id': doc_id, 'text': text, 'metadata': metadata}))
+        
+        return [result for _, result in heapq.nlargest(n_results, scored, key=itemgetter(0))]
+    
     def hybrid_search(
         self,
         query: str,
@@ -170,65 +467,73 @@ class ChromaManager:
             n_results: Number of results to return
             semantic_weight: Weight for semantic similarity
             keyword_weight: Weight for keyword matching
-            
+        
         Returns:
             List of ranked results
         """
+        return self.hybrid_search_batch([query], n_results, semantic_weight, keyword_weight)[0]
+    
+    def hybrid_search_batch(
+        self,
+        queries: List[str],
+        n_results: int = 8,
+        semantic_weight: float = 0.7,
+        keyword_weight: float = 0.3
+    ) -> List[List[Dict]]:
+        """
+        Perform hybrid search for several queries, batching both search legs.
+        
+        Args:
+            queries: Search queries
+            n_results: Number of results to return per query
+            semantic_weight: Weight for semantic similarity
+            keyword_weight: Weight for keyword matching
+        
+        Returns:
+            One list of ranked results per query, in input order
+        """
+        if not queries:
+            return []
+        
         # Get more results for reranking
         search_n = n_results * 2
         
         # Semantic search
-        semantic_results = self.search(query, n_results=search_n)
+        semantic_batches = self.search_batch(queries, n_results=search_n)
         
-        # Keyword search using where_document
-        keyword_results = self.collection.query(
-            query_texts=[query],
-            n_results=search_n
-        )
+        # Semantic ranking alone decides the order when keywords carry no weight
+        if not keyword_weight:
+            return [results[:n_results] for results in semantic_batches]
         
-        # Combine and rerank results
-        result_scores = {}
-        
-        # Score semantic results
-        for i, result in enumerate(semantic_results):
-            doc_id = result['id']
-            # Normalize rank to 0-1 score (higher rank = lower score)
-            semantic_score = 1 - (i / len(semantic_results))
-            result_scores[doc_id] = {
-                'result': result,
-                'score': semantic_score * semantic_weight
-            }
-        
-        # Add keyword scores
-        if keyword_results['ids'] and keyword_results['ids'][0]:
-            for i, doc_id in enumerate(keyword_results['ids'][0]):
-                keyword_score = 1 - (i / len(keyword_results['ids'][0]))
-                
-                if doc_id in result_scores:
-                    result_scores[doc_id]['score'] += keyword_score * keyword_weight
+        final_batches = []
+        for query, semantic_results in zip(queries, semantic_batches):
+            # Keyword search using where_document
+            keyword_results = self._keyword_search(query, search_n)
+            keyword_ids = [result['id'] for result in keyword_results]
+            
+            # Combine and rerank results
+            semantic_ids = [result['id'] for result in semantic_results]
+            ranked_ids = fuse_rankings(semantic_ids, keyword_ids, n_results, semantic_weight, keyword_weight)
+            
+            # Keyword-only hits have no semantic score; each borrows the one fused
+            # just above it, so re-sorting by similarity keeps it beside that hit and
+            # the similarity threshold still judges them
+            results_by_id = {result['id']: result for result in semantic_results}
+            keyword_by_id = {result['id']: result for result in keyword_results}
+            neighbour = semantic_results[0] if semantic_results else {'distance': None, 'similarity': 0.0}
+            final_results = []
+            for doc_id in ranked_ids:
+                if doc_id in results_by_id:
+                    neighbour = results_by_id[doc_id]
+                    final_results.append(neighbour)
                 else:
-                    result_scores[doc_id] = {
-                        'result': {
-                            'id': doc_id,
-                            'text': keyword_results['documents'][0][i],
-                            'metadata': keyword_results['metadatas'][0][i],
-                            'distance': keyword_results['distances'][0][i] if 'distances' in keyword_results else None
-                        },
-                        'score': keyword_score * keyword_weight
-                    }
-        
-        # Sort by combined score
-        ranked_results = sorted(
-            result_scores.values(),
-            key=lambda x: x['score'],
-            reverse=True
-        )[:n_results]
-        
-        # Extract results
-        final_results = [item['result'] for item in ranked_results]
-        
-        logger.info(f"Hybrid search returned {len(final_results)} results")
-        return final_results
+                    final_results.append({
+                        **keyword_by_id[doc_id], 'distance': neighbour['distance'], 'similarity': neighbour['similarity']
+                    })
+            final_batches.append(final_results)
+        
+        logger.info(f"Hybrid search returned {sum(map(len, final_batches))} results for {len(queries)} queries")
+        return final_batches
     
     def get_collection_stats(self) -> Dict:
         """Get statistics about the collection."""
@@ -246,6 +551,9 @@ class ChromaManager:
             name=self.collection_name,
             metadata={"description": "PDF document chunks with embeddings"}
         )
+        self._clear_search_cache()
+        self._filename_ids = {}
+        self._save_filename_index()
         logger.info(f"Cleared collection '{self.collection_name}'")
     
     def delete_by_filename(self, filename: str) -> None:
@@ -255,7 +563,35 @@ class ChromaManager:
         Args:
             filename: Name of the file to delete
         """
-        self.collection.delete(
-            where={"filename": filename}
-        )
-        logger.info(f"Deleted chunks from file: {filename}")
+        self.delete_by_filenames([filename])
+    
+    def delete_by_filenames(self, filenames: List[str]) -> None:
+        """
+        Delete all chunks from several files with as few deletes as possible.
+        
+        Indexed files are deleted by id in one call; only files missing from the
+        filename index (e.g. a collection written before the index existed) fall
+        back to a single metadata-filtered delete. The index assumes this manager
+        is the collection's only writer.
+        
+        Args:
+            filenames: Names of the files to delete
+        """
+        ids = []
+        unindexed = []
+        for filename in filenames:
+            if filename in self._filename_ids:
+                ids.extend(self._filename_ids.pop(filename))
+            else:
+                unindexed.append(filename)
+        
+        if ids:
+            self.collection.delete(ids=ids)
+        if unindexed:
+            self.collection.delete(
+                where={"filename": unindexed[0]} if len(unindexed) == 1 else {"filename": {"$in": unindexed}}
+            )
+        
+        self._clear_search_cache()
+        self._save_filename_index()
+        logger.info(f"Deleted chunks from files: {', '.join(filenames)}")
@@ -0,0 +1,509 @@
+"""FAISS vector store manager."""
+from collections import Counter
+from typing import List, Dict, Optional, Set
+import os
+import numpy as np
+try:
+    import faiss
+except ImportError:  # faiss is optional; only needed for the "faiss" backend
+    faiss = None
+from src.utils import setup_logger, get_paths, get_settings, ensure_dir, save_json, load_json, file_exists
+from src.embeddings import EmbeddingGenerator
+from .keywords import keyword_terms, tokenize
+from .rank_fusion import fuse_rankings
+
+logger = setup_logger(__name__)
+
+# Scalar quantizer used to store vectors in the HNSW index (None keeps float32)
+_QUANTIZERS = {
+    'none': None,
+    'fp16': 'QT_fp16',
+    'int8': 'QT_8bit'
+}
+
+
+class FaissManager:
+    """
+    Manage a FAISS HNSW index for document chunks.
+    
+    Drop-in alternative to ChromaManager: vectors live in an HNSW graph and the
+    chunk texts and metadata in a JSON docstore next to it. Distances are squared
+    L2, the same as Chroma's default space, so similarity thresholds carry over.
+    """
+    
+    def __init__(self, collection_name: str = "pdf_documents"):
+        """
+        Initialize FAISS manager.
+        
+        Args:
+            collection_name: Name of the collection (used for the index file names)
+        """
+        if faiss is None:
+            raise ImportError("The 'faiss' vector store backend requires faiss-cpu (pip install faiss-cpu)")
+        
+        self.paths = get_paths()
+        self.settings_config = get_settings()
+        self.collection_name = collection_name
+        
+        vector_store_config = self.settings_config.get('vector_store', {})
+        self.hnsw_m = vector_store_config.get('faiss_hnsw_m', 32)
+        self.ef_search = vector_store_config.get('faiss_ef_search', 64)
+        self.quantization = vector_store_config.get('faiss_quantization', 'none')
+        if self.quantization not in _QUANTIZERS:
+            raise ValueError(f"Unknown faiss_quantization: {self.quantization}")
+        # Quantizers that need training (int8) are trained once this many vectors exist
+        self.train_min_vectors = vector_store_config.get('faiss_train_min_vectors', 1000)
+        
+        # Ensure persist directory exists
+        persist_dir = self.paths['faiss_persist_dir']
+        ensure_dir(persist_dir)
+        self.index_path = os.path.join(persist_dir, f"{collection_name}.index")
+        self.docstore_path = os.path.join(persist_dir, f"{collection_name}_docstore.json")
+        
+        # id -> {'text', 'metadata'}; ids are the int64 labels stored in the index
+        self.index = None
+        self.records: Dict[int, Dict] = {}
+        self.next_id = 0
+        
+        # word -> ids of the chunks containing it, for the keyword leg of hybrid search
+        self._token_index: Dict[str, Set[int]] = {}
+        self._load()
+        
+        # Adds are written to disk by flush(); deletes and clears are written at once
+        self._dirty = False
+        
+        # Embedding generator is created on first use; stats and deletes never need it
+        self._embedding_generator: Optional[EmbeddingGenerator] = None
+        
+        logger.info(f"FAISS initialized: collection='{collection_name}', persist_dir='{persist_dir}'")
+    
+    def _new_index(self, dim: int, train: bool = False):
+        """
+        Create an empty HNSW index that keeps our own ids.
+        
+        With faiss_quantization set, vectors are stored as fp16 (2x smaller) or
+        int8 (4x smaller) instead of float32. A quantizer that needs training is
+        only used when train is set (by _maybe_quantize); otherwise the index
+        starts as float32 until enough vectors exist to train on.
+        """
+        quantizer = _QUANTIZERS[self.quantization]
+        hnsw = None
+        if quantizer is not None:
+            hnsw = faiss.IndexHNSWSQ(dim, getattr(faiss.ScalarQuantizer, quantizer), self.hnsw_m)
+            if not (hnsw.is_trained or train):
+                hnsw = None
+        if hnsw is None:
+            hnsw = faiss.IndexHNSWFlat(dim, self.hnsw_m)
+        hnsw.hnsw.efSearch = self.ef_search
+        return faiss.IndexIDMap2(hnsw)
+    
+    def _maybe_quantize(self) -> None:
+        """
+        Convert a float32 index to the configured trained quantizer.
+        
+        Runs once the index holds train_min_vectors vectors. They are read back
+        exactly from the float32 graph, so the quantizer is trained on all of
+        them rather than on the first window ingested.
+        """
+        if _QUANTIZERS[self.quantization] is None or self.index is None:
+            return
+        hnsw = faiss.downcast_index(self.index.index)
+        if not isinstance(hnsw, faiss.IndexHNSWFlat) or hnsw.ntotal < self.train_min_vectors:
+            return
+        
+        vectors = hnsw.reconstruct_n(0, hnsw.ntotal)
+        ids = faiss.vector_to_array(self.index.id_map)
+        index = self._new_index(vectors.shape[1], train=True)
+        index.train(vectors)
+        index.add_with_ids(vectors, ids)
+        self.index = index
+        logger.info(f"Trained {self.quantization} quantizer on {len(ids)} vectors")
+    
+    def _load(self) -> None:
+        """Load the index and docstore from disk if they exist."""
+        if not (file_exists(self.index_path) and file_exists(self.docstore_path)):
+            return
+        
+        self.index = faiss.read_index(self.index_path)
+        faiss.downcast_index(self.index.index).hnsw.efSearch = self.ef_search
+        
+        docstore = load_json(self.docstore_path)
+        self.next_id = docstore.get('next_id', 0)
+        self.records = {
+            record['id']: {'text': record['text'], 'metadata': record['metadata']}
+            for record in docstore.get('records', [])
+        }
+        for doc_id, record in self.records.items():
+            self._index_tokens(doc_id, record['text'])
+    
+    def _index_tokens(self, doc_id: int, text: str) -> None:
+        """Add a chunk's words to the token index."""
+        for token in tokenize(text):
+            self._token_index.setdefault(token, set()).add(doc_id)
+    
+    def _unindex_tokens(self, doc_id: int, text: str) -> None:
+        """Remove a chunk's words from the token index."""
+        for token in tokenize(text):
+            doc_ids = self._token_index.get(token)
+            if doc_ids is not None:
+                doc_ids.discard(doc_id)
+                if not doc_ids:
+                    del self._token_index[token]
+    
+    def _persist(self) -> None:
+        """Write the index and docstore to disk."""
+        self._dirty = False
+        if self.index is None:
+            for path in (self.index_path, self.docstore_path):
+                if file_exists(path):
+                    os.remove(path)
+            return
+        
+        faiss.write_index(self.index, self.index_path)
+        save_json({
+            'next_id': self.next_id,
+            'records': [{'id': doc_id, **record} for doc_id, record in self.records.items()]
+        }, self.docstore_path)
+    
+    def flush(self) -> None:
+        """
+        Write the index and docstore if chunks were added since the last write.
+        
+        Adds only change the in-memory index, so an ingest that adds many
+        windows should call this once at the end.
+        """
+        if self._dirty:
+            self._persist()
+    
+    @property
+    def embedding_generator(self) -> EmbeddingGenerator:
+        """Embedding generator for chunks and queries, created on first access."""
+        if self._embedding_generator is None:
+            self._embedding_generator = EmbeddingGenerator()
+        return self._embedding_generator
+    
+    def add_chunks(
+        self,
+        chunks: List[Dict],
+        batch_size: int = 100,
+        embeddings: Optional[np.ndarray] = None
+    ) -> None:
+        """
+        Add chunks to the vector store; call flush() to write them to disk.
+        
+        Args:
+            chunks: List of chunk dictionaries with text, metadata, and optionally embeddings
+            batch_size: Unused; FAISS adds the whole array at once (kept for API parity)
+            embeddings: Optional [len(chunks), dim] array; row i is the embedding of chunks[i].
+                Takes precedence over any 'embedding' field on the chunks.
+        """
+        if not chunks:
+            logger.warning("No chunks to add")
+            return
+        
+        logger.info(f"Adding {len(chunks)} chunks to FAISS")
+        
+        if embeddings is None:
+            if 'embedding' in chunks[0]:
+                embeddings = [chunk['embedding'] for chunk in chunks]
+            else:
+                logger.info("Chunks don't have embeddings, generating them...")
+                chunks, embeddings = self.embedding_generator.embed_chunks_array(chunks)
+        
+        if len(embeddings) != len(chunks):
+            raise ValueError(f"Got {len(embeddings)} embeddings for {len(chunks)} chunks")
+        
+        vectors = np.ascontiguousarray(embeddings, dtype=np.float32)
+        if self.index is None:
+            self.index = self._new_index(vectors.shape[1])
+        
+        ids = np.arange(self.next_id, self.next_id + len(chunks), dtype=np.int64)
+        self.next_id += len(chunks)
+        
+        for doc_id, chunk in zip(ids.tolist(), chunks):
+            # Same flattened metadata as ChromaManager
+            metadata = chunk.get('metadata', {})
+            self.records[doc_id] = {
+                'text': chunk['text'],
+                'metadata': {
+                    'chunk_id': chunk.get('chunk_id', 0),
+                    'page_number': metadata.get('page_number', 0),
+                    'document_title': metadata.get('document_title', ''),
+                    'filename': metadata.get('filename', ''),
+                    'word_count': chunk.get('word_count', 0)
+                }
+            }
+            self._index_tokens(doc_id, chunk['text'])
+        
+        self.index.add_with_ids(vectors, ids)
+        self._maybe_quantize()
+        self._dirty = True
+        
+        logger.info(f"Successfully added {len(chunks)} chunks to FAISS")
+    
+    def _matches(self, record: Dict, where: Optional[Dict], where_document: Optional[Dict]) -> bool:
+        """Check a record against simple equality and $contains filters."""
+        if where and any(record['metadata'].get(key) != value for key, value in where.items()):
+            return False
+        if where_document and where_document.get('$contains', '') not in record['text']:
+            return False
+        return True
+    
+    def _search_vectors(
+        self,
+        query_embeddings: List[List[float]],
+        n_results: int,
+        where: Optional[Dict],
+        where_document: Optional[Dict]
+    ) -> List[List[Dict]]:
+        """Run one batched index search and format each query's hits."""
+        if self.index is None or self.index.ntotal == 0:
+            return [[] for _ in query_embeddings]
+        
+        # Filters are applied afterwards, so filtered searches rank the whole index
+        filtered = bool(where or where_document)
+        k = self.index.ntotal if filtered else min(n_results, self.index.ntotal)
+        distances, labels = self.index.search(np.asarray(query_embeddings, dtype=np.float32), k)
+        
+        # Format results
+        batches = []
+        for row_distances, row_labels in zip(distances.tolist(), labels.tolist()):
+            formatted_results = []
+            for distance, doc_id in zip(row_distances, row_labels):
+                if doc_id < 0:
+                    continue
+                record = self.records[doc_id]
+                if filtered and not self._matches(record, where, where_document):
+                    continue
+                formatted_results.append({
+                    'id': str(doc_id),
+                    'text': record['text'],
+                    'metadata': record['metadata'],
+                    'distance': distance,
+                    'similarity': 1 - distance
+                })
+                if len(formatted_results) == n_results:
+                    break
+            batches.append(formatted_results)
+        return batches
+    
+    def search(
+        self,
+        query: str,
+        n_results: int = 8,
+        where: Optional[Dict] = None,
+        where_document: Optional[Dict] = None
+    ) -> List[Dict]:
+        """
+        Search for relevant chunks using semantic similarity.
+        
+        Args:
+            query: Search query
+            n_results: Number of results to return
+            where: Metadata filter (field equality only)
+            where_document: Document content filter ({'$contains': text} only)
+        
+        Returns:
+            List of result dictionaries with text, metadata, and distance
+        """
+        # Generate query embedding
+        query_embedding = self.embedding_generator.embed_query(query)
+        formatted_results = self._search_vectors([query_embedding], n_results, where, where_document)[0]
+        
+        logger.info(f"Found {len(formatted_results)} results for query")
+        return formatted_results
+    
+    def search_batch(
+        self,
+        queries: List[str],
+        n_results: int = 8,
+        where: Optional[Dict] = None,
+        where_document: Optional[Dict] = None
+    ) -> List[List[Dict]]:
+        """
+        Semantic search for several queries with one embedding request and one index search.
+        
+        Args:
+            queries: Search queries
+            n_results: Number of results to return per query
+            where: Metadata filter (field equality only)
+            where_document: Document content filter ({'$contains': text} only)
+        
+        Returns:
+            One list of result dictionaries per query, in input order
+        """
+        if not queries:
+            return []
+        
+        query_embeddings = self.embedding_generator.embed_queries(queries)
+        formatted_results = self._search_vectors(query_embeddings, n_results, where, where_document)
+        
+        logger.info(f"Found {sum(map(len, formatted_results))} results for {len(queries)} queries")
+        return formatted_results
+    
+    def _keyword_search(self, query: str, n_results: int) -> List[str]:
+        """
+        Rank chunk ids by how many of the query's keyword terms they contain.
+        
+        Candidates come from the token index, so only chunks sharing a term with
+        the query are looked at.
+        
+        Args:
+            query: Search query
+            n_results: Number of ids to return
+        
+        Returns:
+            Chunk ids, best match first; ties go to the earlier chunk
+        """
+        hits = Counter()
+        for term in keyword_terms(query):
+            hits.update(self._token_index.get(term, ()))
+        
+        ranked = sorted(hits.items(), key=lambda hit: (-hit[1], hit[0]))
+        return [str(doc_id) for doc_id, _ in ranked[:n_results]]
+    
+    def hybrid_search(
+        self,
+        query: str,
+        n_results: int = 8,
+        semantic_weight: float = 0.7,
+        keyword_weight: float = 0.3
+    ) -> List[Dict]:
+        """
+        Perform hybrid search combining semantic and keyword matching.
+        
+        Args:
+            query: Search query
+            n_results: Number of results to return
+            semantic_weight: Weight for semantic similarity
+            keyword_weight: Weight for keyword matching
+        
+        Returns:
+            List of ranked results
+        """
+        return self.hybrid_search_batch([query], n_results, semantic_weight, keyword_weight)[0]
+    
+    def hybrid_search_batch(
+        self,
+        queries: List[str],
+        n_results: int = 8,
+        semantic_weight: float = 0.7,
+        keyword_weight: float = 0.3
+    ) -> List[List[Dict]]:
+        """
+        Perform hybrid search for several queries with a single semantic search.
+        
+        Args:
+            queries: Search queries
+            n_results: Number of results to return per query
+            semantic_weight: Weight for semantic similarity
+            keyword_weight: Weight for keyword matching
+        
+        Returns:
+            One list of ranked results per query, in input order
+        """
+        if not queries:
+            return []
+        
+        # Get more results for reranking
+        search_n = n_results * 2
+        
+        # Semantic search
+        semantic_batches = self.search_batch(queries, n_results=search_n)
+        
+        # Semantic ranking alone decides the order when keywords carry no weight
+        if not keyword_weight:
+            return [results[:n_results] for results in semantic_batches]
+        
+        final_batches = []
+        for query, semantic_results in zip(queries, semantic_batches):
+            # Keyword search: rank chunks by how many query terms they contain
+            keyword_ids = self._keyword_search(query, search_n)
+            
+            # Combine and rerank results
+            semantic_ids = [result['id'] for result in semantic_results]
+            ranked_ids = fuse_rankings(semantic_ids, keyword_ids, n_results, semantic_weight, keyword_weight)
+            
+            # Keyword-only hits have no semantic score; each borrows the one fused
+            # just above it, so re-sorting by similarity keeps it beside that hit and
+            # the similarity threshold still judges them
+            results_by_id = {result['id']: result for result in semantic_results}
+            neighbour = semantic_results[0] if semantic_results else {'distance': None, 'similarity': 0.0}
+            final_results = []
+            for doc_id in ranked_ids:
+                if doc_id in results_by_id:
+                    neighbour = results_by_id[doc_id]
+                    final_results.append(neighbour)
+                else:
+                    record = self.records[int(doc_id)]
+                    final_results.append({
+                        'id': doc_id,
+                        'text': record['text'],
+                        'metadata': record['metadata'],
+                        'distance': neighbour['distance'],
+                        'similarity': neighbour['similarity']
+                    })
+            final_batches.append(final_results)
+        
+        logger.info(f"Hybrid search returned {sum(map(len, final_batches))} results for {len(queries)} queries")
+        return final_batches
+    
+    def get_collection_stats(self) -> Dict:
+        """Get statistics about the collection."""
+        return {
+            'collection_name': self.collection_name,
+            'total_chunks': self.index.ntotal if self.index is not None else 0,
+            'persist_directory': self.paths['faiss_persist_dir']
+        }
+    
+    def clear_collection(self) -> None:
+        """Clear all data from the collection."""
+        self.index = None
+        self.records = {}
+        self.next_id = 0
+        self._token_index = {}
+        self._persist()
+        logger.info(f"Cleared collection '{self.collection_name}'")
+    
+    def delete_by_filename(self, filename: str) -> None:
+        """
+        Delete all chunks from a specific file.
+        
+        Args:
+            filename: Name of the file to delete
+        """
+        self.delete_by_filenames([filename])
+    
+    def delete_by_filenames(self, filenames: List[str]) -> None:
+        """
+        Delete all chunks from several files with a single index rebuild.
+        
+        HNSW graphs don't support removal, so the index is rebuilt from the
+        remaining vectors.
+        
+        Args:
+            filenames: Names of the files to delete
+        """
+        if self.index is None:
+            return
+        
+        hnsw = faiss.downcast_index(self.index.index)
+        vectors = hnsw.reconstruct_n(0, hnsw.ntotal)
+        ids = faiss.vector_to_array(self.index.id_map)
+        
+        doomed = set(filenames)
+        keep = np.fromiter(
+            (self.records[doc_id]['metadata'].get('filename') not in doomed for doc_id in ids.tolist()),
+            dtype=bool,
+            count=len(ids)
+        )
+        for doc_id in ids[~keep].tolist():
+            self._unindex_tokens(doc_id, self.records.pop(doc_id)['text'])
+        
+        # Emptying the index keeps its type and any trained quantizer
+        self.index.reset()
+        if keep.any():
+            self.index.add_with_ids(vectors[keep], ids[keep])
+        self._persist()
+        
+        logger.info(f"Deleted chunks from files: {', '.join(filenames)}")
@@ -0,0 +1,43 @@
+"""Query term extraction shared by the vector stores' keyword search."""
+import re
+from typing import List, Set
+
+_WORD_RE = re.compile(r'\w+')
+
+# The longest remaining query terms are the keyword signal
+_KEYWORD_MAX_TERMS = 3
+_KEYWORD_MIN_CHARS = 3
+
+# Question words and fillers long enough to pass the length check
+_STOPWORDS = frozenset({
+    'about', 'all', 'and', 'any', 'are', 'been', 'but', 'can', 'could', 'describe',
+    'did', 'does', 'explain', 'for', 'from', 'give', 'had', 'has', 'have', 'how',
+    'into', 'its', 'list', 'may', 'might', 'must', 'not', 'our', 'please', 'should',
+    'tell', 'than', 'that', 'the', 'their', 'them', 'there', 'these', 'they', 'this',
+    'those', 'was', 'were', 'what', 'when', 'where', 'which', 'who', 'whom', 'whose',
+    'why', 'will', 'with', 'would', 'you', 'your'
+})
+
+
+def tokenize(text: str) -> Set[str]:
+    """Lowercased distinct words of a text, punctuation stripped."""
+    return set(_WORD_RE.findall(text.lower()))
+
+
+def keyword_terms(query: str) -> List[str]:
+    """
+    Pick the query's most distinctive terms for keyword matching.
+    
+    Args:
+        query: Search query
+    
+    Returns:
+        Up to three lowercased terms, longest first; stopwords and words
+        shorter than three characters are dropped
+    """
+    terms = {
+        term for term in tokenize(query)
+        if len(term) >= _KEYWORD_MIN_CHARS and term not in _STOPWORDS
+    }
+    # Alphabetical tie-break keeps the pick deterministic
+    return sorted(terms, key=lambda term: (-len(term), term))[:_KEYWORD_MAX_TERMS]
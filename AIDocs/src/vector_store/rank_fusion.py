@@ -0,0 +1,46 @@
+"""Reciprocal Rank Fusion of semantic and keyword result rankings."""
+import heapq
+from typing import List, Sequence
+
+# Damping constant from the original RRF paper; keeps top ranks from dominating
+RRF_K = 60
+
+
+def fuse_rankings(
+    semantic_ids: Sequence[str],
+    keyword_ids: Sequence[str],
+    n_results: int,
+    semantic_weight: float = 0.7,
+    keyword_weight: float = 0.3,
+    k: int = RRF_K
+) -> List[str]:
+    """
+    Merge two ranked id lists with Reciprocal Rank Fusion.
+
+    Each id scores 1 / (k + rank) in every list it appears in, with ranks
+    starting at 1. The weights only break ties between equal fused scores, so
+    a top keyword-only hit can outrank weaker semantic hits; any remaining
+    ties keep semantic order first. Weighting the fused scores directly would
+    let the larger weight swamp rank: at 0.7/0.3 every semantic hit down to
+    rank 82 beats the best keyword-only hit.
+
+    Args:
+        semantic_ids: Ids ranked by semantic similarity
+        keyword_ids: Ids ranked by keyword matching
+        n_results: Number of ids to return
+        semantic_weight: Tie-break weight for the semantic ranking
+        keyword_weight: Tie-break weight for the keyword ranking
+        k: RRF damping constant
+
+    Returns:
+        Up to n_results ids, best first
+    """
+    # id -> [fused score, weighted score]
+    scores = {}
+    for ids, weight in ((semantic_ids, semantic_weight), (keyword_ids, keyword_weight)):
+        for rank, doc_id in enumerate(ids, k + 1):
+            score = scores.setdefault(doc_id, [0.0, 0.0])
+            score[0] += 1.0 / rank
+            score[1] += weight / rank
+
+    return [doc_id for doc_id, _ in heapq.nlargest(n_results, scores.items(), key=lambda item: tuple(item[1]))]
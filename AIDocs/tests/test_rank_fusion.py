@@ -0,0 +1,26 @@
+"""Tests for Reciprocal Rank Fusion of semantic and keyword rankings."""
+from src.vector_store.rank_fusion import fuse_rankings
+
+
+def test_strong_keyword_only_hit_surfaces():
+    semantic_ids = [f"s{i}" for i in range(16)]
+    keyword_ids = ["k0", "k1"]
+
+    fused = fuse_rankings(semantic_ids, keyword_ids, n_results=8, semantic_weight=0.7, keyword_weight=0.3)
+
+    assert "k0" in fused
+    # Ties with the top semantic hit, which wins on weight, then beats the rest
+    assert fused[:3] == ["s0", "k0", "s1"]
+
+
+def test_weights_break_ties():
+    fused = fuse_rankings(["s0"], ["k0"], n_results=2, semantic_weight=0.3, keyword_weight=0.7)
+
+    assert fused == ["k0", "s0"]
+
+
+def test_hits_in_both_lists_rank_first():
+    fused = fuse_rankings(["a", "b", "c"], ["c", "d"], n_results=4)
+
+    assert fused[0] == "c"
+    assert len(fused) == 4